@@ -0,0 +1,92 @@
+"""Initial schema
+
+Tables as previously created by Base.metadata.create_all. Databases that
+already have them should be stamped rather than upgraded:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False, unique=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_table(
+        "magazines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("base_price", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_magazines_id", "magazines", ["id"])
+    op.create_table(
+        "plans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("renewal_period", sa.Integer(), nullable=False),
+        sa.Column("tier", sa.Integer(), nullable=False),
+        sa.Column("discount", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_plans_id", "plans", ["id"])
+    op.create_table(
+        "subscriptions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("magazine_id", sa.Integer(), sa.ForeignKey("magazines.id"), nullable=False),
+        sa.Column("plan_id", sa.Integer(), sa.ForeignKey("plans.id"), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("renewal_date", sa.Date(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_subscriptions_id", "subscriptions", ["id"])
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("token_digest", sa.String(), nullable=False, unique=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_revoked_tokens_id", "revoked_tokens", ["id"])
+    op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+    op.create_table(
+        "revoked_users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False, unique=True),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_revoked_users_id", "revoked_users", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("revoked_users")
+    op.drop_table("revoked_tokens")
+    op.drop_table("subscriptions")
+    op.drop_table("plans")
+    op.drop_table("magazines")
+    op.drop_table("users")
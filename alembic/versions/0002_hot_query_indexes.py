@@ -0,0 +1,50 @@
+"""Indexes for the hot query paths
+
+- ix_subscriptions_user_id_id: get_subscriptions (user_id filter, id order)
+- uq_subscriptions_active_user_magazine_plan: partial unique index over
+  active rows, so the database enforces "one active subscription per
+  magazine and plan" and create_subscription's lookup is an index probe
+
+users.email (reset_password) and users.username (login, refresh) are already
+covered by the indexes behind their UNIQUE constraints.
+
+Creating the unique index fails if duplicate active subscriptions already
+exist; deactivate the extras first.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_subscriptions_user_id_id", "subscriptions", ["user_id", "id"]
+    )
+    op.create_index(
+        "uq_subscriptions_active_user_magazine_plan",
+        "subscriptions",
+        ["user_id", "magazine_id", "plan_id"],
+        unique=True,
+        sqlite_where=sa.text("is_active = 1"),
+        postgresql_where=sa.text("is_active"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_subscriptions_active_user_magazine_plan", table_name="subscriptions")
+    op.drop_index("ix_subscriptions_user_id_id", table_name="subscriptions")
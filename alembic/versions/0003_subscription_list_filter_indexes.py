@@ -0,0 +1,45 @@
+"""Indexes for the subscription list filters
+
+- ix_subscriptions_user_id_is_active_id: get_subscriptions?is_active=...,
+  keeping the keyset (id) order inside the index
+- ix_subscriptions_user_id_renewal_date: the renewal date range filter
+
+The magazine_id / plan_id filters on active rows use the partial unique index
+from 0002; every other filter is bounded by the user's rows via
+ix_subscriptions_user_id_id.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_subscriptions_user_id_is_active_id",
+        "subscriptions",
+        ["user_id", "is_active", "id"],
+    )
+    op.create_index(
+        "ix_subscriptions_user_id_renewal_date",
+        "subscriptions",
+        ["user_id", "renewal_date"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_subscriptions_user_id_renewal_date", table_name="subscriptions")
+    op.drop_index("ix_subscriptions_user_id_is_active_id", table_name="subscriptions")
@@ -0,0 +1,35 @@
+"""Indexes on the catalog natural keys used by imports
+
+- ix_magazines_name: magazines are matched by name
+- ix_plans_title_tier: plans are matched by (title, tier)
+
+Not unique: existing catalogs may already hold duplicates, in which case the
+importer updates the lowest id.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_magazines_name", "magazines", ["name"])
+    op.create_index("ix_plans_title_tier", "plans", ["title", "tier"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_plans_title_tier", table_name="plans")
+    op.drop_index("ix_magazines_name", table_name="magazines")
@@ -0,0 +1,38 @@
+"""Partial index on active subscriptions by renewal date
+
+- ix_subscriptions_active_renewal_date: (renewal_date, id) over active rows,
+  so the renewal engine's "due on or before" scan is an index range scan
+  that never visits inactive history
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_subscriptions_active_renewal_date",
+        "subscriptions",
+        ["renewal_date", "id"],
+        sqlite_where=sa.text("is_active = 1"),
+        postgresql_where=sa.text("is_active"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_subscriptions_active_renewal_date", table_name="subscriptions")
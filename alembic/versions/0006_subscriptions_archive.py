@@ -0,0 +1,48 @@
+"""Archive table for inactive subscriptions
+
+- subscriptions_archive: same columns as subscriptions plus archived_at;
+  ids are copied from subscriptions, so the primary key is not generated
+- ix_subscriptions_archive_user_id_id: a user's archived history in id order
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "subscriptions_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("magazine_id", sa.Integer(), sa.ForeignKey("magazines.id"), nullable=False),
+        sa.Column("plan_id", sa.Integer(), sa.ForeignKey("plans.id"), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("renewal_date", sa.Date(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_subscriptions_archive_user_id_id",
+        "subscriptions_archive",
+        ["user_id", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_subscriptions_archive_user_id_id", table_name="subscriptions_archive")
+    op.drop_table("subscriptions_archive")
@@ -0,0 +1,37 @@
+"""Version column for optimistic concurrency on subscriptions
+
+- subscriptions.version: bumped by every write, checked by modifications
+- subscriptions_archive.version: carried over by the archiver
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ("subscriptions", "subscriptions_archive"):
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default=sa.text("1")),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("subscriptions_archive", "subscriptions"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("version")
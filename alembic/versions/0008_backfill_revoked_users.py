@@ -0,0 +1,38 @@
+"""Backfill revoked_users from users deactivated before it existed
+
+Token refresh only checks the revocation list, so every inactive user needs
+a revoked_users row. Databases stamped at 0001 got the table empty.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    users = sa.table("users", sa.column("id"), sa.column("is_active"))
+    revoked_users = sa.table("revoked_users", sa.column("user_id"), sa.column("revoked_at"))
+    inactive = sa.select(users.c.id, sa.func.current_timestamp()).where(
+        users.c.is_active == sa.false(),
+        users.c.id.not_in(sa.select(revoked_users.c.user_id)),
+    )
+    op.execute(revoked_users.insert().from_select(["user_id", "revoked_at"], inactive))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Backfilled rows can't be told apart from later revocations; keep them
+    pass
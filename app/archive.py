@@ -0,0 +1,98 @@
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, literal, select
+import models as models
+from subscription_cache import subscription_cache
+
+# Hot/cold split: inactive subscriptions whose renewal_date is more than
+# ARCHIVE_AFTER_DAYS old move from subscriptions to subscriptions_archive, a
+# batch per transaction (copy, then delete), so the hot table and its
+# indexes only hold rows that live traffic touches. GET /subscriptions/{id}
+# falls back to the archive; the list routes, exports and snapshots only see
+# the hot table.
+
+ARCHIVE_COLUMNS = ("id", "user_id", "magazine_id", "plan_id", "price", "renewal_date", "is_active", "version")
+
+
+@dataclass
+class ArchiveReport:
+    cutoff: date
+    archived: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.archived / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "cutoff": self.cutoff.isoformat(),
+            "archived": self.archived,
+            "batches": self.batches,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def archivable(cutoff: date, after_id: int, below_id: int, limit: int, skip_locked: bool = False):
+    subscription = models.Subscription
+    statement = (
+        select(subscription.id)
+        .where(
+            subscription.id > after_id,
+            subscription.id < below_id,
+            subscription.is_active == False,
+            subscription.renewal_date < cutoff,
+        )
+        .order_by(subscription.id)
+        .limit(limit)
+    )
+    if skip_locked:
+        statement = statement.with_for_update(skip_locked=True)
+    return statement
+
+
+def copy_to_archive(ids: list[int], archived_at: datetime):
+    hot = models.Subscription.__table__
+    return insert(models.SubscriptionArchive).from_select(
+        [*ARCHIVE_COLUMNS, "archived_at"],
+        select(*(hot.c[name] for name in ARCHIVE_COLUMNS), literal(archived_at))
+        .where(hot.c.id.in_(ids)),
+    )
+
+
+def archive_subscriptions(session_factory, as_of: date, older_than_days: int, batch_size: int = 1000, on_progress=None) -> ArchiveReport:
+    report = ArchiveReport(as_of - timedelta(days=older_than_days))
+    subscription = models.Subscription
+    with session_factory() as db:
+        skip_locked = db.get_bind().dialect.name == "postgresql"
+        # SQLite hands out max(id) + 1 to new rows, so moving the newest row
+        # out could let its id be reused and clash in the archive
+        below_id = db.scalar(select(func.max(subscription.id))) or 0
+        after_id = 0
+        while True:
+            ids = db.scalars(archivable(report.cutoff, after_id, below_id, batch_size, skip_locked)).all()
+            if not ids:
+                db.rollback()
+                break
+            after_id = ids[-1]
+            db.execute(copy_to_archive(ids, datetime.now(timezone.utc).replace(tzinfo=None)))
+            user_ids = db.scalars(
+                delete(subscription)
+                .where(subscription.id.in_(ids))
+                .returning(subscription.user_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+            subscription_cache.invalidate_users(user_ids)
+
+            report.archived += len(ids)
+            report.batches += 1
+            report.elapsed = time.perf_counter() - report.started
+            if on_progress is not None:
+                on_progress(report)
+    report.elapsed = time.perf_counter() - report.started
+    return report
@@ -0,0 +1,579 @@
+from datetime import timedelta
+from operator import itemgetter
+from typing import Annotated, List
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from jose import jwt
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import auth as auth
+import models as models
+import bulk
+import queries
+from auth import authenticate_user_async, create_access_token, oauth2_bearer
+from catalog import catalog_cache
+from config import settings
+from conditional import not_modified
+from fastjson import trusted_response
+from db.async_session import get_async_db
+from hashing import password_hasher
+from pagination import page_dependency
+from pricing import calculate_price, price_matrix_cache
+from schemas.magazine import Magazine, MagazineCreate, MagazineUpdate
+from schemas.plan import Plan, PlanCreate, PlanUpdate
+from schemas.subscription import Subscription, SubscriptionCreate, SubscriptionUpdate
+from schemas.tokens import Token
+from schemas.user import UserCreate, UserLogin, UserOut
+from subscription_cache import list_key, render, subscription_cache
+from token_cache import token_digest
+
+# Async twins of the database routes in main.py, mounted instead of them when
+# ASYNC_DB is set. Each request awaits the DB instead of parking a threadpool
+# thread, so concurrency is bounded by the connection pool.
+router = APIRouter()
+
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+user_dependency = Annotated[dict, Depends(auth.get_current_user)]
+
+
+async def first(db: AsyncSession, statement):
+    result = await db.execute(statement.limit(1))
+    return result.scalars().first()
+
+
+##############################################################################################################
+# Users
+
+
+# Register user
+@router.post(
+    "/users/register",
+    response_model=UserOut,
+    status_code=status.HTTP_200_OK,
+    tags=["users"],
+)
+async def register_user(user: UserCreate, db: async_db_dependency):
+    db_user = await first(
+        db,
+        select(models.User.id).where(
+            or_(models.User.username == user.username, models.User.email == user.email)
+        ),
+    )
+    if db_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered",
+        )
+    # Same as the sync route: don't hold a pooled connection across bcrypt
+    await db.close()
+    new_user = models.User(
+        username=user.username,
+        hashed_password=await password_hasher.hash(user.password),
+        email=user.email,
+        is_active=True,
+    )
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return {"id": new_user.id, "username": new_user.username, "email": new_user.email}
+
+
+# Login user
+@router.post("/users/login", response_model=Token, tags=["users"])
+async def login_user(login_request: UserLogin, db: async_db_dependency):
+    user = await authenticate_user_async(db, login_request.username, login_request.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
+        )
+
+    access_token = create_access_token(
+        user.username, user.id, expires_delta=timedelta(minutes=15)
+    )
+    refresh_token = create_access_token(
+        user.username, user.id, expires_delta=timedelta(days=7)
+    )
+
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+# Reset password
+@router.post("/users/reset-password", status_code=status.HTTP_200_OK, tags=["users"])
+async def reset_password(
+    db: async_db_dependency,
+    email: str = Query(..., description="User's email address"),
+):
+    db_user = await first(db, select(models.User).where(models.User.email == email))
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    reset_token = secrets.token_urlsafe(32)
+    print(f"Mock email sent with token: {reset_token}")
+
+    return {"message": "Password reset process initiated"}
+
+
+# Deactivate a user
+@router.delete(
+    "/users/deactivate/{username}", status_code=status.HTTP_200_OK, tags=["users"]
+)
+async def deactivate_user(
+    username: str, db: async_db_dependency, current_user: user_dependency
+):
+    user = await first(db, select(models.User).where(models.User.username == username))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.is_active = False
+    await db.commit()
+    await auth.revocation_list.revoke_user_async(db, user.id)
+    auth.token_cache.invalidate_user(user.id)
+    return {"message": "User deactivated successfully"}
+
+
+# Logout: revoke the presented token
+@router.post("/users/logout", status_code=status.HTTP_200_OK, tags=["users"])
+async def logout_user(
+    token: Annotated[str, Depends(oauth2_bearer)],
+    db: async_db_dependency,
+    current_user: user_dependency,
+):
+    payload = jwt.get_unverified_claims(token)
+    await auth.revocation_list.revoke_token_async(
+        db, token_digest(token), current_user["user_id"], payload["exp"]
+    )
+    auth.token_cache.invalidate_user(current_user["user_id"])
+    return {"message": "Logged out successfully"}
+
+
+# Get current user
+@router.get(
+    "/users/me", response_model=UserOut, status_code=status.HTTP_200_OK, tags=["users"]
+)
+async def user(user: user_dependency, db: async_db_dependency):
+    db_user = await db.get(models.User, user["user_id"])
+    if db_user is None:
+        raise HTTPException(status_code=401, detail="Authentication Failed")
+    return {"id": db_user.id, "username": db_user.username, "email": db_user.email}
+
+
+##############################################################################################################
+# Magazines
+
+
+# Get all magazines
+@router.get("/magazines/", response_model=List[Magazine], tags=["magazines"])
+async def get_magazines(db: async_db_dependency, page: page_dependency):
+    magazines = await catalog_cache.get_async("magazines", db)
+    return not_modified(page.request, page.response, magazines) or trusted_response(
+        page.slice(magazines.items, magazines.ids), page.response
+    )
+
+
+# Create a new magazine
+@router.post("/magazines/", response_model=Magazine, tags=["magazines"])
+async def create_magazine(magazine: MagazineCreate, db: async_db_dependency):
+    db_magazine = models.Magazine(
+        name=magazine.name,
+        description=magazine.description,
+        base_price=magazine.base_price,
+    )
+    db.add(db_magazine)
+    await db.commit()
+    await db.refresh(db_magazine)
+    catalog_cache.invalidate("magazines")
+    return db_magazine
+
+
+# Get a specific magazine
+@router.get("/magazines/{magazine_id}", response_model=Magazine, tags=["magazines"])
+async def get_magazine(
+    magazine_id: int, db: async_db_dependency, request: Request, response: Response
+):
+    magazine = await catalog_cache.lookup_async("magazines", db, magazine_id)
+    if magazine is None:
+        raise HTTPException(status_code=404, detail="Magazine not found")
+    magazines = await catalog_cache.get_async("magazines", db)
+    return not_modified(request, response, magazines) or magazine
+
+
+# Update a magazine
+@router.put("/magazines/{magazine_id}", response_model=Magazine, tags=["magazines"])
+async def update_magazine(
+    magazine_id: int, magazine: MagazineUpdate, db: async_db_dependency
+):
+    db_magazine = await db.get(models.Magazine, magazine_id)
+    if db_magazine is None:
+        raise HTTPException(status_code=404, detail="Magazine not found")
+    db_magazine.name = magazine.name
+    db_magazine.description = magazine.description
+    db_magazine.base_price = magazine.base_price
+    await db.commit()
+    await db.refresh(db_magazine)
+    catalog_cache.invalidate("magazines")
+    return db_magazine
+
+
+# Delete a magazine
+@router.delete("/magazines/{magazine_id}", tags=["magazines"])
+async def delete_magazine(magazine_id: int, db: async_db_dependency):
+    db_magazine = await db.get(models.Magazine, magazine_id)
+    if db_magazine is None:
+        raise HTTPException(status_code=404, detail="Magazine not found")
+    await db.delete(db_magazine)
+    await db.commit()
+    catalog_cache.invalidate("magazines")
+    return {"message": "Magazine deleted successfully"}
+
+
+##############################################################################################################
+# Plans
+
+
+# Get all plans
+@router.get("/plans/", response_model=List[Plan], tags=["plans"])
+async def get_plans(db: async_db_dependency, page: page_dependency):
+    plans = await catalog_cache.get_async("plans", db)
+    return not_modified(page.request, page.response, plans) or trusted_response(
+        page.slice(plans.items, plans.ids), page.response
+    )
+
+
+# Create a new plan
+@router.post("/plans/", response_model=Plan, tags=["plans"])
+async def create_plan(plan: PlanCreate, db: async_db_dependency):
+    db_plan = models.Plan(
+        title=plan.title,
+        description=plan.description,
+        renewal_period=plan.renewal_period,
+        tier=plan.tier,
+        discount=plan.discount,
+    )
+    db.add(db_plan)
+    await db.commit()
+    await db.refresh(db_plan)
+    catalog_cache.invalidate("plans")
+    return db_plan
+
+
+# Get a specific plan
+@router.get("/plans/{plan_id}", response_model=Plan, tags=["plans"])
+async def get_plan(
+    plan_id: int, db: async_db_dependency, request: Request, response: Response
+):
+    plan = await catalog_cache.lookup_async("plans", db, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    plans = await catalog_cache.get_async("plans", db)
+    return not_modified(request, response, plans) or plan
+
+
+# Update a plan
+@router.put("/plans/{plan_id}", response_model=Plan, tags=["plans"])
+async def update_plan(plan_id: int, plan: PlanUpdate, db: async_db_dependency):
+    db_plan = await db.get(models.Plan, plan_id)
+    if db_plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    db_plan.title = plan.title
+    db_plan.description = plan.description
+    db_plan.renewal_period = plan.renewal_period
+    db_plan.tier = plan.tier
+    db_plan.discount = plan.discount
+    await db.commit()
+    await db.refresh(db_plan)
+    catalog_cache.invalidate("plans")
+    return db_plan
+
+
+# Delete a plan
+@router.delete("/plans/{plan_id}", tags=["plans"])
+async def delete_plan(plan_id: int, db: async_db_dependency):
+    db_plan = await db.get(models.Plan, plan_id)
+    if db_plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    await db.delete(db_plan)
+    await db.commit()
+    catalog_cache.invalidate("plans")
+    return {"message": "Plan deleted successfully"}
+
+
+##############################################################################################################
+# Pricing
+
+
+# Price of every magazine under every plan, optionally narrowed to some
+# magazines and/or plan tiers
+@router.get("/pricing/matrix", tags=["pricing"])
+async def get_price_matrix(
+    db: async_db_dependency,
+    magazine_ids: Annotated[list[int] | None, Query()] = None,
+    tiers: Annotated[list[int] | None, Query()] = None,
+):
+    matrix = price_matrix_cache.get(
+        await catalog_cache.get_async("magazines", db), await catalog_cache.get_async("plans", db)
+    )
+    if magazine_ids or tiers:
+        matrix = matrix.select(magazine_ids, tiers)
+    return Response(content=matrix.body, media_type="application/json")
+
+
+##############################################################################################################
+# Subscriptions
+
+
+# Get all subscriptions for the current user; the serialized page is cached
+# per user until one of their subscriptions changes
+@router.get("/subscriptions/", response_model=List[Subscription], tags=["subscriptions"])
+async def get_subscriptions(
+    request: Request,
+    db: async_db_dependency,
+    current_user: user_dependency,
+    page: page_dependency,
+    filters: queries.subscription_filters_dependency,
+):
+    user_id, key = current_user["user_id"], list_key(request)
+    cached = subscription_cache.get(user_id, key)
+    if cached is not None:
+        return cached.response()
+    ticket = subscription_cache.ticket()
+    statement = select(*queries.SUBSCRIPTION_COLUMNS).where(
+        models.Subscription.user_id == user_id, *filters
+    )
+    result = await db.execute(page.apply(statement, models.Subscription.id))
+    entry = render(page.finish(result.mappings().all(), key=itemgetter("id")), page.response)
+    subscription_cache.put(user_id, key, entry, ticket)
+    return entry.response()
+
+
+# Create a new subscription for the current user
+@router.post("/subscriptions/", response_model=None, tags=["subscriptions"])
+async def create_subscription(
+    subscription: SubscriptionCreate,
+    db: async_db_dependency,
+    current_user: user_dependency,
+):
+    magazine = await catalog_cache.lookup_async("magazines", db, subscription.magazine_id)
+    plan = await catalog_cache.lookup_async("plans", db, subscription.plan_id)
+    if magazine is None or plan is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+        )
+
+    price = models.check_price(calculate_price(magazine["base_price"], plan["discount"]))
+
+    try:
+        result = await db.execute(
+            queries.insert_subscription(
+                user_id=current_user["user_id"],
+                magazine_id=subscription.magazine_id,
+                plan_id=subscription.plan_id,
+                price=price,
+                renewal_date=subscription.renewal_date,
+                is_active=True,
+            )
+        )
+        new_subscription = result.mappings().one()
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        if queries.is_foreign_key_violation(error):
+            # Deleted by another worker since our catalog snapshot
+            catalog_cache.clear()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+            )
+        if not queries.is_active_subscription_conflict(error):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Active subscription already exists",
+        )
+    subscription_cache.invalidate_user(current_user["user_id"])
+    return dict(new_subscription)
+
+
+# Create many subscriptions for the current user from a JSON array or an
+# NDJSON stream; every item gets its own result instead of failing the batch
+@router.post("/subscriptions/bulk", tags=["subscriptions"])
+async def create_subscriptions_bulk(
+    request: Request, db: async_db_dependency, current_user: user_dependency
+):
+    results, taken = [], set()
+    chunks = bulk.read_chunks(
+        request, settings.BULK_CHUNK_SIZE, settings.BULK_MAX_ITEMS, settings.BULK_MAX_JSON_BYTES
+    )
+    try:
+        async for chunk in chunks:
+            await create_subscription_chunk(db, current_user["user_id"], chunk, taken)
+            results.extend(item.result for item in chunk)
+    finally:
+        subscription_cache.invalidate_user(current_user["user_id"])
+    return bulk.summary(results)
+
+
+async def create_subscription_chunk(db: AsyncSession, user_id: int, chunk: list, taken: set):
+    magazine_ids, plan_ids = bulk.catalog_ids(chunk)
+    if not magazine_ids:
+        return
+    magazines = await catalog_cache.lookup_many_async("magazines", db, magazine_ids)
+    plans = await catalog_cache.lookup_many_async("plans", db, plan_ids)
+    if magazines:
+        pairs = await db.execute(queries.active_subscription_pairs(user_id, list(magazines)))
+        taken.update(tuple(pair) for pair in pairs)
+    items = bulk.plan_chunk(chunk, user_id, magazines, plans, taken)
+    if not items:
+        return
+    try:
+        result = await db.execute(
+            queries.insert_subscriptions(), [item.values for item in items]
+        )
+        rows = result.mappings().all()
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request got in first; retry one row at a time
+        await db.rollback()
+        for item in items:
+            try:
+                result = await db.execute(queries.insert_subscription(**item.values))
+                row = result.mappings().one()
+                await db.commit()
+            except IntegrityError as error:
+                await db.rollback()
+                bulk.resolve_conflict(item, error)
+            else:
+                item.resolve("created", subscription=dict(row))
+        return
+    for item, row in zip(items, rows):
+        item.resolve("created", subscription=dict(row))
+
+
+# Get a specific subscription
+@router.get("/subscriptions/{id}", response_model=Subscription, tags=["subscriptions"])
+async def get_subscription(id: int, db: async_db_dependency, current_user: user_dependency):
+    subscription = await first(
+        db,
+        select(models.Subscription).where(
+            models.Subscription.id == id,
+            models.Subscription.user_id == current_user["user_id"],
+        ),
+    )
+    if not subscription:
+        # History moved out of the hot table by archive.py
+        subscription = await first(
+            db,
+            select(models.SubscriptionArchive).where(
+                models.SubscriptionArchive.id == id,
+                models.SubscriptionArchive.user_id == current_user["user_id"],
+            ),
+        )
+    if not subscription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found"
+        )
+    return subscription
+
+
+# Modify a subscription: deactivate it and create its replacement, re-priced
+# from the catalog, in one transaction
+@router.put(
+    "/subscriptions/{subscription_id}",
+    response_model=Subscription,
+    tags=["subscriptions"],
+)
+async def update_subscription(
+    subscription_id: int,
+    subscription_update: SubscriptionUpdate,
+    db: async_db_dependency,
+    current_user: user_dependency,
+):
+    magazine = await catalog_cache.lookup_async("magazines", db, subscription_update.magazine_id)
+    plan = await catalog_cache.lookup_async("plans", db, subscription_update.plan_id)
+    if magazine is None or plan is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+        )
+    price = models.check_price(calculate_price(magazine["base_price"], plan["discount"]))
+
+    user_id = (
+        await db.execute(
+            queries.retire_subscription(
+                subscription_id, current_user["user_id"], subscription_update.version
+            )
+        )
+    ).scalar()
+    if user_id is None:
+        await db.rollback()
+        subscription = await db.get(models.Subscription, subscription_id)
+        if subscription is None or subscription.user_id != current_user["user_id"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Subscription was modified concurrently",
+        )
+
+    try:
+        result = await db.execute(
+            queries.insert_subscription(
+                user_id=user_id,
+                magazine_id=subscription_update.magazine_id,
+                plan_id=subscription_update.plan_id,
+                price=price,
+                renewal_date=subscription_update.renewal_date,
+                is_active=True,
+            )
+        )
+        new_subscription = result.mappings().one()
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        if queries.is_foreign_key_violation(error):
+            catalog_cache.clear()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+            )
+        if not queries.is_active_subscription_conflict(error):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Active subscription already exists",
+        )
+    subscription_cache.invalidate_user(user_id)
+    return dict(new_subscription)
+
+
+# Deactivate a subscription for the current user
+@router.delete(
+    "/subscriptions/{subscription_id}",
+    response_model=Subscription,
+    tags=["subscriptions"],
+)
+async def delete_subscription(
+    subscription_id: int, db: async_db_dependency, current_user: user_dependency
+):
+    subscription = await first(
+        db,
+        select(models.Subscription).where(
+            models.Subscription.id == subscription_id,
+            models.Subscription.user_id == current_user["user_id"],
+        ),
+    )
+    if not subscription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found"
+        )
+
+    subscription.is_active = False
+    subscription.version = models.Subscription.version + 1
+    await db.commit()
+    subscription_cache.invalidate_user(current_user["user_id"])
+    await db.refresh(subscription)
+    return subscription
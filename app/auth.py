@@ -1,14 +1,24 @@
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 from db.session import SessionLocal
 from models import User
-from passlib.context import CryptContext
+from hashing import bcrypt_context, password_hasher
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from schemas.tokens import Token
+from config import settings
+from token_cache import TokenCache, token_digest
+from revocation import RevocationList
+import tracing
+
+if TYPE_CHECKING:
+    # Only needed with ASYNC_DB, which brings in greenlet
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Define the router
@@ -21,8 +31,15 @@ router = APIRouter(
 SECRET_KEY = "5759412be1b91e65d20afbe1cf10088c4fd275da27bacfd6d47157d8f4e90eef"     #openssl rand -hex 32
 ALGORITHM = "HS256"
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="token/")
+token_cache = TokenCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS
+)
+revocation_list = RevocationList(
+    SessionLocal,
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+)
 
 
 def get_db():
@@ -38,7 +55,7 @@ db_dependency = Annotated[Session, Depends(get_db)]
 @router.post("/", response_model=Token)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,Depends()],
                                   db: db_dependency ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,11 +68,34 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
 
 
 
-def authenticate_user(db: Session, username: str, password: str):
+def find_user(db: Session, username: str):
     user = db.query(User).filter(User.username == username).first()
+    # Hand the connection back to the pool before waiting on bcrypt, otherwise
+    # a burst of logins pins every pooled connection while they queue for the
+    # hash pool
+    db.close()
+    return user
+
+
+async def authenticate_user(db: Session, username: str, password: str):
+    # The sync session's query runs in the threadpool, off the event loop
+    user = await run_in_threadpool(find_user, db, username)
+    if not user:
+        return False
+    if not await password_hasher.verify(password, user.hashed_password):
+        return False
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+    return user
+
+async def authenticate_user_async(db: "AsyncSession", username: str, password: str):
+    result = await db.execute(select(User).where(User.username == username).limit(1))
+    user = result.scalars().first()
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.hashed_password):
+    # Same as authenticate_user: don't hold a pooled connection across bcrypt
+    await db.close()
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
@@ -83,13 +123,40 @@ def create_refresh_token(username: str, user_id: int, expires_delta: timedelta):
     return encoded_jwt
 
 
+async def is_revoked(digest: bytes, user_id: int) -> bool:
+    # The lifespan loads the list before serving; this only covers an app
+    # run without it, and still keeps the database off the event loop
+    if not revocation_list.loaded:
+        await run_in_threadpool(revocation_list.rebuild)
+    return revocation_list.is_revoked(digest, user_id)
+
+
 async def get_current_user(token : Annotated[str,Depends(oauth2_bearer)]):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")
-        if username is None or user_id is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-        return {"username": username, "user_id": user_id}
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    with tracing.span("auth.get_current_user") as span:
+        digest = token_digest(token)
+        principal = token_cache.get(digest)
+        if span is not None:
+            span.set_attribute("auth.token_cache_hit", principal is not None)
+        if principal is None:
+            try:
+                with tracing.span("auth.jwt_decode"):
+                    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            except JWTError:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+            username: str = payload.get("sub")
+            user_id: int = payload.get("id")
+            if username is None or user_id is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+            principal = {"username": username, "user_id": user_id}
+            if payload.get("exp") is not None:
+                token_cache.put(digest, principal, payload["exp"])
+        # Checked on cache hits too: another worker may have revoked the token
+        if await is_revoked(digest, principal["user_id"]):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+        return principal
+
+
+async def get_admin_user(current_user: Annotated[dict, Depends(get_current_user)]):
+    if current_user["username"] not in settings.ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -0,0 +1,193 @@
+import json
+from contextlib import aclosing
+from dataclasses import dataclass
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+import models as models
+import queries
+from pricing import calculate_price
+from schemas.subscription import SubscriptionCreate
+
+# Helpers for POST /subscriptions/bulk, shared by main.py and async_routes.py.
+# The routes read the body in chunks (read_chunks), resolve each chunk's
+# catalog entries and existing subscriptions set-wise, let plan_chunk decide
+# every item, and insert the survivors in one multi-row INSERT per chunk.
+#
+# Request size is bounded twice: a JSON array body, and any single NDJSON
+# line, may be at most max_bytes (413 otherwise), and reading stops after
+# max_items items.
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+@dataclass
+class BulkItem:
+    index: int
+    subscription: SubscriptionCreate | None = None
+    result: dict | None = None
+    values: dict | None = None
+
+    def resolve(self, outcome: str, **fields):
+        self.result = {"index": self.index, "status": outcome, **fields}
+
+
+def _validate(index: int, payload) -> BulkItem:
+    item = BulkItem(index)
+    try:
+        item.subscription = SubscriptionCreate.model_validate(payload)
+    except ValidationError as error:
+        item.resolve(
+            "invalid",
+            detail=error.errors(include_url=False, include_context=False, include_input=False),
+        )
+    return item
+
+
+def _parse_line(index: int, line: bytes) -> BulkItem:
+    try:
+        payload = json.loads(line)
+    except ValueError:
+        item = BulkItem(index)
+        item.resolve("invalid", detail="Malformed JSON line")
+        return item
+    return _validate(index, payload)
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"JSON array bodies and NDJSON lines are limited to {max_bytes} bytes; "
+        "send larger batches as NDJSON",
+    )
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise _too_large(max_bytes)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise _too_large(max_bytes)
+    return bytes(body)
+
+
+async def read_items(request: Request, max_bytes: int):
+    """Yield a BulkItem per element of a JSON array or line of NDJSON.
+
+    NDJSON is parsed as it arrives, so the body is never held in memory; a
+    JSON array is read whole, so it is capped at ``max_bytes``.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in NDJSON_MEDIA_TYPES:
+        index, buffer = 0, b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if len(line) > max_bytes:
+                    raise _too_large(max_bytes)
+                if line.strip():
+                    yield _parse_line(index, line)
+                    index += 1
+            if len(buffer) > max_bytes:
+                raise _too_large(max_bytes)
+        if buffer.strip():
+            yield _parse_line(index, buffer)
+        return
+
+    try:
+        payload = json.loads(await _read_body(request, max_bytes))
+    except ValueError:
+        payload = None
+    if not isinstance(payload, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON",
+        )
+    for index, element in enumerate(payload):
+        yield _validate(index, element)
+
+
+async def read_chunks(request: Request, size: int, max_items: int, max_bytes: int):
+    """Yield the items in lists of ``size``.
+
+    Past ``max_items`` the rest of the body is left unread, and answered with
+    a single invalid result.
+    """
+    chunk = []
+    async with aclosing(read_items(request, max_bytes)) as items:
+        async for item in items:
+            if item.index >= max_items:
+                item.resolve(
+                    "invalid",
+                    detail=f"Batch limit of {max_items} items exceeded; the rest was not read",
+                )
+                chunk.append(item)
+                break
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def catalog_ids(chunk: list[BulkItem]) -> tuple[set, set]:
+    pending = [item.subscription for item in chunk if item.result is None]
+    return {s.magazine_id for s in pending}, {s.plan_id for s in pending}
+
+
+def plan_chunk(chunk: list[BulkItem], user_id: int, magazines: dict, plans: dict, taken: set) -> list[BulkItem]:
+    """Resolve not-found, duplicate and unpriceable items; return the rest.
+
+    ``taken`` holds the user's active (magazine_id, plan_id) pairs, both from
+    the database and from earlier items of the batch, and is updated in place.
+    """
+    to_insert = []
+    for item in chunk:
+        if item.result is not None:
+            continue
+        subscription = item.subscription
+        key = (subscription.magazine_id, subscription.plan_id)
+        magazine, plan = magazines.get(key[0]), plans.get(key[1])
+        if magazine is None or plan is None:
+            item.resolve("not_found", detail="Magazine or Plan not found")
+            continue
+        if key in taken:
+            item.resolve("duplicate", detail="Active subscription already exists")
+            continue
+        try:
+            price = models.check_price(calculate_price(magazine["base_price"], plan["discount"]))
+        except HTTPException as error:
+            item.resolve("invalid", detail=error.detail)
+            continue
+        taken.add(key)
+        item.values = {
+            "user_id": user_id,
+            "magazine_id": subscription.magazine_id,
+            "plan_id": subscription.plan_id,
+            "price": price,
+            "renewal_date": subscription.renewal_date,
+            "is_active": True,
+        }
+        to_insert.append(item)
+    return to_insert
+
+
+def resolve_conflict(item: BulkItem, error: IntegrityError):
+    if queries.is_active_subscription_conflict(error):
+        item.resolve("duplicate", detail="Active subscription already exists")
+    elif queries.is_foreign_key_violation(error):
+        item.resolve("not_found", detail="Magazine or Plan not found")
+    else:
+        raise error
+
+
+def summary(results: list[dict]) -> dict:
+    counts = {"created": 0, "duplicate": 0, "not_found": 0, "invalid": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {**counts, "results": results}
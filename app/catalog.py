@@ -0,0 +1,214 @@
+import threading
+import time
+import hashlib
+import json
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import models as models
+from config import settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Columns of the Magazine / Plan response schemas
+CATALOG_COLUMNS = {
+    "magazines": (
+        models.Magazine.id,
+        models.Magazine.name,
+        models.Magazine.description,
+        models.Magazine.base_price,
+    ),
+    "plans": (
+        models.Plan.id,
+        models.Plan.title,
+        models.Plan.description,
+        models.Plan.renewal_period,
+        models.Plan.tier,
+        models.Plan.discount,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One table of the catalog: rows in id order plus an id -> row map.
+
+    ``digest`` hashes the rows, so it matches across workers and restarts
+    whenever the content does (see conditional.py).
+    """
+
+    version: int
+    loaded_at: float
+    modified_at: float
+    digest: str = ""
+    items: tuple = ()
+    ids: tuple = ()
+    by_id: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(cls, version: int, rows) -> "CatalogSnapshot":
+        items = tuple(dict(row) for row in rows)
+        now = time.time()
+        return cls(
+            version=version,
+            loaded_at=now,
+            modified_at=now,
+            digest=hashlib.blake2b(
+                json.dumps(items, sort_keys=True, default=str).encode(), digest_size=16
+            ).hexdigest(),
+            items=items,
+            ids=tuple(item["id"] for item in items),
+            by_id={item["id"]: item for item in items},
+        )
+
+
+class CatalogCache:
+    """In-process snapshots of the magazines and plans tables.
+
+    The write routes call ``invalidate`` after committing, which bumps the
+    table's version and drops its snapshot; the next read reloads the whole
+    table in one SELECT. ``ttl`` bounds how long a snapshot can miss writes
+    made by other worker processes; a reload that finds different rows
+    also bumps the version, so ``version`` always identifies the content.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, CatalogSnapshot] = {}
+        self._versions = {name: 0 for name in CATALOG_COLUMNS}
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.invalidations = 0
+
+    def get(self, name: str, db: Session) -> CatalogSnapshot:
+        snapshot, version = self._cached(name)
+        if snapshot is None:
+            rows = db.execute(_load(name)).mappings().all()
+            snapshot = self._store(name, version, rows)
+        return snapshot
+
+    async def get_async(self, name: str, db: "AsyncSession") -> CatalogSnapshot:
+        snapshot, version = self._cached(name)
+        if snapshot is None:
+            rows = (await db.execute(_load(name))).mappings().all()
+            snapshot = self._store(name, version, rows)
+        return snapshot
+
+    def lookup(self, name: str, db: Session, item_id: int) -> dict | None:
+        return self.lookup_many(name, db, [item_id]).get(item_id)
+
+    async def lookup_async(self, name: str, db: "AsyncSession", item_id: int) -> dict | None:
+        return (await self.lookup_many_async(name, db, [item_id])).get(item_id)
+
+    def lookup_many(self, name: str, db: Session, item_ids) -> dict[int, dict]:
+        found, missing = _split(self.get(name, db), item_ids)
+        if missing:
+            # Possibly created by another worker since the snapshot was taken
+            rows = db.execute(_load_ids(name, missing)).mappings().all()
+            found.update(self._found(name, rows))
+        return found
+
+    async def lookup_many_async(self, name: str, db: "AsyncSession", item_ids) -> dict[int, dict]:
+        found, missing = _split(await self.get_async(name, db), item_ids)
+        if missing:
+            rows = (await db.execute(_load_ids(name, missing))).mappings().all()
+            found.update(self._found(name, rows))
+        return found
+
+    def version(self, name: str) -> int:
+        return self._versions[name]
+
+    def peek(self, name: str) -> CatalogSnapshot | None:
+        """The snapshot if it is still fresh, without loading or counting."""
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and time.time() - snapshot.loaded_at < self.ttl:
+            return snapshot
+        return None
+
+    def invalidate(self, name: str):
+        with self._lock:
+            self._versions[name] += 1
+            self._snapshots.pop(name, None)
+            self.invalidations += 1
+
+    def clear(self):
+        for name in CATALOG_COLUMNS:
+            self.invalidate(name)
+
+    def _cached(self, name: str):
+        with self._lock:
+            snapshot = self.peek(name)
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot, snapshot.version
+            self.misses += 1
+            return None, self._versions[name]
+
+    def _found(self, name: str, rows) -> dict[int, dict]:
+        if rows:
+            self.invalidate(name)
+        return {row["id"]: dict(row) for row in rows}
+
+    def _store(self, name: str, version: int, rows) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot.from_rows(version, rows)
+        with self._lock:
+            self.rebuilds += 1
+            # A write that landed while we were loading makes these rows
+            # possibly stale; serve them to this request but don't keep them
+            if self._versions[name] != version:
+                return snapshot
+            previous = self._snapshots.get(name)
+            if previous is not None and previous.version == version:
+                if previous.digest == snapshot.digest:
+                    # TTL reload with nothing changed
+                    snapshot = replace(snapshot, modified_at=previous.modified_at)
+                else:
+                    # Changed by another worker
+                    self._versions[name] += 1
+                    snapshot = replace(snapshot, version=self._versions[name])
+            self._snapshots[name] = snapshot
+        return snapshot
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "rebuilds": self.rebuilds,
+                "invalidations": self.invalidations,
+                "tables": {
+                    name: {
+                        "version": version,
+                        "size": len(self._snapshots[name].items) if name in self._snapshots else None,
+                    }
+                    for name, version in self._versions.items()
+                },
+            }
+
+
+def _load(name: str):
+    columns = CATALOG_COLUMNS[name]
+    return select(*columns).order_by(columns[0])
+
+
+def _load_ids(name: str, item_ids):
+    columns = CATALOG_COLUMNS[name]
+    return select(*columns).where(columns[0].in_(item_ids))
+
+
+def _split(snapshot: CatalogSnapshot, item_ids):
+    found, missing = {}, set()
+    for item_id in item_ids:
+        item = snapshot.by_id.get(item_id)
+        if item is None:
+            missing.add(item_id)
+        else:
+            found[item_id] = item
+    return found, missing
+
+
+catalog_cache = CatalogCache(settings.CATALOG_CACHE_TTL_SECONDS)
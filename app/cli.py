@@ -0,0 +1,178 @@
+"""Command line maintenance tasks.
+
+Run from the repository root with the same environment as the API, e.g.
+
+    python app/cli.py import-catalog magazines catalog.csv
+    python app/cli.py export-subscriptions --format csv --gzip -o subscriptions.csv.gz
+    python app/cli.py snapshot --dir snapshots --incremental
+    python app/cli.py renew --as-of 2025-01-31
+    python app/cli.py expire --grace-days 7
+    python app/cli.py archive --older-than-days 365
+"""
+import argparse
+import datetime
+import json
+import sys
+from config import settings
+from db.session import SessionLocal
+import archive
+import expiry
+import exporter
+import importer
+import queries
+import renewals
+import snapshot
+
+
+def import_catalog(args):
+    fmt = args.format or importer.format_for_path(args.path)
+    if fmt is None:
+        sys.exit(f"Can't tell the format of {args.path}; pass --format")
+    with open(args.path, encoding="utf-8", newline="") as lines:
+        report = importer.import_catalog(
+            SessionLocal, args.table, lines, fmt, args.chunk_size, settings.IMPORT_MAX_ERRORS
+        )
+    # Running API workers pick the changes up within CATALOG_CACHE_TTL_SECONDS
+    json.dump(report.as_dict(), sys.stdout, indent=2, default=str)
+    print()
+    return 1 if report.error_count else 0
+
+
+def export_subscriptions(args):
+    filters = queries.subscription_filters(
+        is_active=args.active,
+        magazine_id=args.magazine_id,
+        plan_id=args.plan_id,
+        renewal_from=args.renewal_from,
+        renewal_to=args.renewal_to,
+    )
+    chunks = exporter.export_subscriptions(
+        SessionLocal, args.format, filters, args.gzip, args.batch_size
+    )
+    output = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    return 0
+
+
+def write_snapshots(args):
+    for table in args.tables or sorted(snapshot.SNAPSHOT_TABLES):
+        part = snapshot.write_snapshot(
+            SessionLocal, table, args.dir, args.format, args.incremental, args.batch_size
+        )
+        print(f"{table}: {part.rows} rows")
+    return 0
+
+
+def renew(args):
+    def progress(report):
+        if report.chunks % args.progress_every == 0:
+            print(
+                f"{report.renewed} renewed, {report.skipped} skipped, "
+                f"{report.contended} contended, {report.rows_per_second:.0f} rows/s",
+                file=sys.stderr,
+            )
+
+    report = renewals.run_renewals(SessionLocal, args.as_of, args.chunk_size, progress)
+    json.dump(report.as_dict(), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+def expire(args):
+    def progress(report):
+        if report.chunks % args.progress_every == 0:
+            print(f"{report.expired} expired, {report.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+    report = expiry.sweep_expired(SessionLocal, args.as_of, args.grace_days, args.chunk_size, progress)
+    json.dump(report.as_dict(), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+def archive_subscriptions(args):
+    def progress(report):
+        if report.batches % args.progress_every == 0:
+            print(f"{report.archived} archived, {report.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+    report = archive.archive_subscriptions(
+        SessionLocal, args.as_of, args.older_than_days, args.batch_size, progress
+    )
+    json.dump(report.as_dict(), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "import-catalog", help="Upsert magazines or plans from a CSV or NDJSON file"
+    )
+    command.add_argument("table", choices=sorted(importer.IMPORT_SPECS))
+    command.add_argument("path")
+    command.add_argument("--format", choices=importer.FORMATS)
+    command.add_argument("--chunk-size", type=int, default=settings.IMPORT_CHUNK_SIZE)
+    command.set_defaults(handler=import_catalog)
+
+    command = commands.add_parser(
+        "export-subscriptions", help="Stream subscriptions as NDJSON or CSV"
+    )
+    command.add_argument("--format", choices=exporter.FORMATS, default="ndjson")
+    command.add_argument("--gzip", action="store_true")
+    command.add_argument("-o", "--output", default="-", help="File to write (default: stdout)")
+    command.add_argument("--active", action=argparse.BooleanOptionalAction, default=None)
+    command.add_argument("--magazine-id", type=int)
+    command.add_argument("--plan-id", type=int)
+    command.add_argument("--renewal-from", type=datetime.date.fromisoformat)
+    command.add_argument("--renewal-to", type=datetime.date.fromisoformat)
+    command.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+    command.set_defaults(handler=export_subscriptions)
+
+    command = commands.add_parser(
+        "snapshot", help="Write Parquet / Arrow IPC snapshots (needs pyarrow)"
+    )
+    command.add_argument("--dir", default="snapshots")
+    command.add_argument("--format", choices=snapshot.FORMATS, default="parquet")
+    command.add_argument("--incremental", action="store_true", help="Only rows past the last snapshot's max id")
+    command.add_argument("--tables", nargs="+", choices=sorted(snapshot.SNAPSHOT_TABLES))
+    command.add_argument("--batch-size", type=int, default=10000)
+    command.set_defaults(handler=write_snapshots)
+
+    command = commands.add_parser(
+        "renew", help="Renew active subscriptions due on or before a date"
+    )
+    command.add_argument("--as-of", type=datetime.date.fromisoformat, default=datetime.date.today())
+    command.add_argument("--chunk-size", type=int, default=1000)
+    command.add_argument("--progress-every", type=int, default=100, help="Chunks between progress lines")
+    command.set_defaults(handler=renew)
+
+    command = commands.add_parser(
+        "expire", help="Deactivate subscriptions lapsed past the grace period"
+    )
+    command.add_argument("--as-of", type=datetime.date.fromisoformat, default=datetime.date.today())
+    command.add_argument("--grace-days", type=int, default=settings.EXPIRY_GRACE_DAYS)
+    command.add_argument("--chunk-size", type=int, default=settings.EXPIRY_CHUNK_SIZE)
+    command.add_argument("--progress-every", type=int, default=100, help="Chunks between progress lines")
+    command.set_defaults(handler=expire)
+
+    command = commands.add_parser(
+        "archive", help="Move old inactive subscriptions to subscriptions_archive"
+    )
+    command.add_argument("--as-of", type=datetime.date.fromisoformat, default=datetime.date.today())
+    command.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    command.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    command.add_argument("--progress-every", type=int, default=100, help="Batches between progress lines")
+    command.set_defaults(handler=archive_subscriptions)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response, status
+from catalog import CatalogSnapshot
+
+
+def etag(snapshot: CatalogSnapshot) -> str:
+    return f'"{snapshot.digest}"'
+
+
+def _matches(if_none_match: str, tag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return tag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def _not_modified_since(if_modified_since: str, modified_at: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return int(modified_at) <= since
+
+
+def not_modified(request: Request, response: Response, snapshot: CatalogSnapshot) -> Response | None:
+    """Validate a catalog GET against the snapshot it would be served from.
+
+    Returns a bodyless 304 when the client's copy is current, so the route
+    can return before serializing anything. Otherwise sets ``ETag`` and
+    ``Last-Modified`` on ``response`` and returns None.
+    """
+    headers = {
+        "ETag": etag(snapshot),
+        "Last-Modified": formatdate(snapshot.modified_at, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _matches(if_none_match, headers["ETag"])
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = if_modified_since is not None and _not_modified_since(
+            if_modified_since, snapshot.modified_at
+        )
+    if fresh:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,5 +1,3 @@
-config.py
-
 from pydantic_settings import BaseSettings
 from fastapi_mail import ConnectionConfig
 
@@ -14,6 +12,114 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool
     VALIDATE_CERTS: bool
 
+    # Database engine (see db/session.py). Starlette runs sync routes on 40
+    # threads, so size pool_size + max_overflow to cover them per worker.
+    DATABASE_URL: str = "sqlite:///./test.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # PostgreSQL only, 0 disables
+
+    # SQLite performance profile, applied on connect
+    SQLITE_PERFORMANCE_PROFILE: bool = True
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Per-request SQL instrumentation (see instrumentation.py): X-DB-* response
+    # headers, and a warning with the captured SQL for requests slower than
+    # SLOW_REQUEST_MS (0 disables the log)
+    SQL_DEBUG_HEADERS: bool = False
+    SLOW_REQUEST_MS: float = 1000.0
+    SLOW_REQUEST_MAX_STATEMENTS: int = 50
+
+    # Prometheus metrics (see metrics.py). With PROMETHEUS_MULTIPROC_DIR set,
+    # each worker copies its request tallies and pool, threadpool and cache
+    # state into the shared metrics this often
+    METRICS_REFRESH_SECONDS: float = 5.0
+
+    # OpenTelemetry tracing (see tracing.py). TRACING_SAMPLE_RATIO applies to
+    # requests arriving without a sampled parent; TRACING_EXPORTER is "otlp",
+    # "console" or "file" (JSON lines appended to TRACING_FILE)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 1.0
+    TRACING_EXPORTER: str = "otlp"
+    TRACING_FILE: str = "traces.jsonl"
+    TRACING_SERVICE_NAME: str = "magazine-subscription"
+
+    # Sampling profiler (see profiler.py): GET /admin/profile and the
+    # X-Profile request header, both admin only and off unless enabled
+    PROFILER_ENABLED: bool = False
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_MAX_SECONDS: float = 60.0
+
+    # Keyset pagination of the list routes (see pagination.py)
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 1000
+
+    # In-process magazine/plan snapshots (see catalog.py); the TTL bounds
+    # staleness from writes made by other workers
+    CATALOG_CACHE_TTL_SECONDS: float = 60.0
+
+    # Encode the magazine and plan lists straight from the catalog snapshot
+    # (with orjson when installed), skipping response_model validation of
+    # every row (see fastjson.py)
+    FAST_JSON_RESPONSES: bool = False
+
+    # Per-user GET /subscriptions/ response cache (see subscription_cache.py);
+    # the TTL bounds staleness from writes made by other processes, and a TTL
+    # or size of 0 disables it
+    SUBSCRIPTION_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    SUBSCRIPTION_CACHE_TTL_SECONDS: float = 30.0
+
+    # POST /subscriptions/bulk: rows per INSERT/commit, items per request, and
+    # the largest JSON array body (read whole) or NDJSON line
+    BULK_CHUNK_SIZE: int = 500
+    BULK_MAX_ITEMS: int = 50000
+    BULK_MAX_JSON_BYTES: int = 1024 * 1024
+
+    # Catalog imports (see importer.py): rows per upsert/commit, and how many
+    # row errors the report keeps
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 1000
+
+    # Rows fetched per round trip by the subscription export (see exporter.py)
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Expiry sweeper (see expiry.py): subscriptions more than EXPIRY_GRACE_DAYS
+    # past their renewal_date are deactivated, EXPIRY_CHUNK_SIZE rows per
+    # UPDATE. A positive EXPIRY_SWEEP_INTERVAL_SECONDS runs the sweep in
+    # every API worker; leave it at 0 to run `cli.py expire` from cron instead.
+    EXPIRY_GRACE_DAYS: int = 7
+    EXPIRY_CHUNK_SIZE: int = 1000
+    EXPIRY_SWEEP_INTERVAL_SECONDS: float = 0.0
+
+    # Archival (see archive.py): inactive subscriptions whose renewal_date is
+    # more than ARCHIVE_AFTER_DAYS old move to subscriptions_archive
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 1000
+
+    # Usernames allowed on the admin routes, e.g. ADMIN_USERNAMES='["alice"]'
+    ADMIN_USERNAMES: list[str] = []
+
+    # Serve the database routes through AsyncSession (see async_routes.py)
+    ASYNC_DB: bool = False
+
+    # Password hashing pool (see hashing.py)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+
+    # Verified bearer token cache (see token_cache.py)
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+
+    # Token revocation list (see revocation.py)
+    REVOCATION_REFRESH_SECONDS: float = 5.0
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+
     class Config:
         env_file = ".env"
 
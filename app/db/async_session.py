@@ -0,0 +1,36 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from db.session import DATABASE_URL, TracedSession, configure_engine, engine_options
+
+# Async drivers for the sync URLs we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} URLs")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL), **engine_options(DATABASE_URL, is_async=True)
+)
+configure_engine(async_engine.sync_engine, DATABASE_URL, "async")
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=TracedSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
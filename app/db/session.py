@@ -1,11 +1,232 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from opentelemetry.trace import SpanKind, StatusCode
+from config import settings
+import tracing
 
-DATABASE_URL = "sqlite:///./test.db"
+DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class PoolStats:
+    """Checkout counters and wait times shared by the sync and async engines."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_checked_out = 0
+        self.engines = []
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_checked_out(self, checked_out: int):
+        if checked_out > self.max_checked_out:
+            self.max_checked_out = checked_out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait / waits * 1000 if waits else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_checked_out": self.max_checked_out,
+            }
+        stats["pools"] = [
+            {
+                "name": name,
+                "size": engine.pool.size(),
+                "checked_out": engine.pool.checkedout(),
+                "overflow": engine.pool.overflow(),
+            }
+            for name, engine in self.engines
+        ]
+        return stats
+
+
+pool_stats = PoolStats()
+
+
+class _TimedCheckout:
+    # Pool events fire after a connection is handed out, so time the wait
+    # around _do_get itself
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        pool_stats.record_checked_out(self.checkedout())
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    parsed = make_url(url)
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep the default pool
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if parsed.get_backend_name() == "postgresql" and timeout_ms:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    elif parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+    return options
+
+
+def apply_sqlite_profile(engine):
+    """Set the SQLite performance pragmas on every new connection."""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+@dataclass
+class QueryStats:
+    """SQL run on behalf of one request (see instrumentation.py)."""
+
+    count: int = 0
+    total: float = 0.0
+    slowest: float = 0.0
+    slowest_statement: str | None = None
+    # (seconds, statement), the first SLOW_REQUEST_MAX_STATEMENTS of them
+    statements: list = field(default_factory=list)
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds >= self.slowest:
+            self.slowest, self.slowest_statement = seconds, statement
+        if len(self.statements) < settings.SLOW_REQUEST_MAX_STATEMENTS:
+            self.statements.append((seconds, statement))
+
+
+# Set per request by the instrumentation middleware; statements run outside
+# a request (lifespan tasks, cli.py) aren't recorded
+current_queries: ContextVar[QueryStats | None] = ContextVar("current_queries", default=None)
+
+
+def instrument_queries(engine):
+    """Time every statement into the current request's QueryStats, and give
+    it a span while tracing is on."""
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if current_queries.get() is not None:
+            context._query_started = time.perf_counter()
+        if tracing.tracer is not None:
+            operation = statement.split(None, 1)[0].upper()
+            context._query_span = tracing.tracer.start_span(
+                operation,
+                kind=SpanKind.CLIENT,
+                attributes={
+                    "db.system.name": dialect,
+                    "db.operation.name": operation,
+                    "db.query.text": statement,
+                },
+            )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        stats = current_queries.get()
+        started = getattr(context, "_query_started", None)
+        if stats is not None and started is not None:
+            stats.record(statement, time.perf_counter() - started)
+        span = getattr(context, "_query_span", None)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def fail_span(exception_context):
+        span = getattr(exception_context.execution_context, "_query_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.set_status(StatusCode.ERROR)
+            span.end()
+
+
+class TracedSession(Session):
+    """Session whose commits and refreshes get spans while tracing is on."""
+
+    def commit(self):
+        with tracing.span("db.commit"):
+            super().commit()
+
+    def refresh(self, instance, *args, **kwargs):
+        with tracing.span("db.refresh"):
+            super().refresh(instance, *args, **kwargs)
+
+
+def configure_engine(engine, url: str, name: str):
+    """Apply the SQLite profile, instrument ``engine`` and register it with
+    pool_stats.
+
+    Takes the sync engine; pass ``async_engine.sync_engine`` for async ones.
+    """
+    if is_sqlite(url) and settings.SQLITE_PERFORMANCE_PROFILE:
+        apply_sqlite_profile(engine)
+    instrument_queries(engine)
+    if isinstance(engine.pool, _TimedCheckout):
+        pool_stats.engines.append((name, engine))
+    return engine
+
+
+engine = configure_engine(create_engine(DATABASE_URL, **engine_options(DATABASE_URL)), DATABASE_URL, "sync")
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=TracedSession)
 
 # Dependency to get DB session
 def get_db():
@@ -13,4 +234,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,93 @@
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from sqlalchemy import func, select, update
+import models as models
+from subscription_cache import subscription_cache
+
+# Expiry sweeper: deactivates active subscriptions whose renewal_date passed
+# more than a grace period ago without being renewed, so they stop weighing
+# on every active-subscription query.
+#
+# Each chunk is one set-based UPDATE in its own short transaction, picking
+# its rows through the partial index on active (renewal_date, id). On
+# PostgreSQL the picking subquery uses FOR UPDATE SKIP LOCKED, so the sweep
+# never waits on rows a request or the renewal engine is holding.
+
+
+@dataclass
+class ExpiryReport:
+    cutoff: date
+    expired: int = 0
+    chunks: int = 0
+    oldest_lapsed: date | None = None
+    started: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.expired / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "cutoff": self.cutoff.isoformat(),
+            "expired": self.expired,
+            "chunks": self.chunks,
+            # How long the oldest lapsed subscription had stayed active past the cutoff
+            "lag_days": (self.cutoff - self.oldest_lapsed).days if self.oldest_lapsed else 0,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def expiry_cutoff(as_of: date, grace_days: int) -> date:
+    return as_of - timedelta(days=grace_days)
+
+
+def lapsed(cutoff: date):
+    subscription = models.Subscription
+    return (subscription.is_active == True, subscription.renewal_date < cutoff)
+
+
+def expire_chunk(cutoff: date, limit: int, skip_locked: bool = False):
+    subscription = models.Subscription
+    picked = (
+        select(subscription.id)
+        .where(*lapsed(cutoff))
+        .order_by(subscription.renewal_date, subscription.id)
+        .limit(limit)
+    )
+    if skip_locked:
+        picked = picked.with_for_update(skip_locked=True)
+    # The outer conditions repeat the inner ones so a row renewed between
+    # the pick and the write is left alone
+    return (
+        update(subscription)
+        .where(subscription.id.in_(picked.scalar_subquery()), *lapsed(cutoff))
+        .values(is_active=False, version=subscription.version + 1)
+        .returning(subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def sweep_expired(session_factory, as_of: date, grace_days: int = 0, chunk_size: int = 1000, on_progress=None) -> ExpiryReport:
+    report = ExpiryReport(expiry_cutoff(as_of, grace_days))
+    with session_factory() as db:
+        skip_locked = db.get_bind().dialect.name == "postgresql"
+        report.oldest_lapsed = db.scalar(
+            select(func.min(models.Subscription.renewal_date)).where(*lapsed(report.cutoff))
+        )
+        db.rollback()
+        while report.oldest_lapsed is not None:
+            user_ids = db.scalars(expire_chunk(report.cutoff, chunk_size, skip_locked)).all()
+            db.commit()
+            if not user_ids:
+                break
+            subscription_cache.invalidate_users(user_ids)
+            report.expired += len(user_ids)
+            report.chunks += 1
+            report.elapsed = time.perf_counter() - report.started
+            if on_progress is not None:
+                on_progress(report)
+    report.elapsed = time.perf_counter() - report.started
+    return report
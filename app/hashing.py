@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+from config import settings
+import tracing
+
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Module level so they can be pickled into a process pool
+def _hash_password(password: str) -> str:
+    return bcrypt_context.hash(password)
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return bcrypt_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification in a dedicated, bounded pool.
+
+    bcrypt costs ~200ms of CPU per call. Doing that inline in an ``async def``
+    route stalls the event loop, and doing it in Starlette's shared threadpool
+    starves every other sync route, so password work gets its own pool.
+    """
+
+    def __init__(self, max_workers: int = 4, executor: str = "thread"):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.max_workers = max_workers
+        self.executor_kind = executor
+        self._executor: Executor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._max_queue_depth = 0
+        self._completed = 0
+        self._total_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing the app never forks or spawns threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix="bcrypt"
+                        )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._in_flight += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth())
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._total_seconds += elapsed
+
+    def _queue_depth(self) -> int:
+        # The pool is FIFO, so everything beyond the worker count is waiting
+        return max(0, self._in_flight - self.max_workers)
+
+    async def hash(self, password: str) -> str:
+        # Spans cover the wait for a pool worker as well as the hashing
+        with tracing.span("bcrypt.hash"):
+            return await self._run(_hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        with tracing.span("bcrypt.verify"):
+            return await self._run(_verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executor": self.executor_kind,
+                "workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queue_depth(),
+                "max_queue_depth": self._max_queue_depth,
+                "completed": self._completed,
+                "avg_seconds": (
+                    self._total_seconds / self._completed if self._completed else 0.0
+                ),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
@@ -0,0 +1,148 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, update
+import models as models
+from catalog import catalog_cache
+from schemas.magazine import MagazineCreate
+from schemas.plan import PlanCreate
+
+# Streaming catalog import shared by POST /admin/import/{table} and cli.py.
+# Rows are validated one at a time and upserted a chunk at a time, keyed on
+# the natural key (magazine name, plan title + tier), so memory stays flat
+# whatever the size of the file.
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    model: type
+    schema: type[BaseModel]
+    key: tuple[str, ...]
+
+
+IMPORT_SPECS = {
+    "magazines": ImportSpec(models.Magazine, MagazineCreate, ("name",)),
+    "plans": ImportSpec(models.Plan, PlanCreate, ("title", "tier")),
+}
+
+FORMATS = ("csv", "ndjson")
+
+
+@dataclass
+class ImportReport:
+    max_errors: int
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, line: int, detail):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "detail": detail})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def format_for(content_type: str | None) -> str | None:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def format_for_path(path: str) -> str | None:
+    suffix = path.rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(suffix)
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | None]]:
+    """Yield (line number, record) pairs; record is None for a malformed line."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Blank CSV cells mean "not given", so optional fields get defaults
+            yield reader.line_num, {k: v for k, v in record.items() if k and v not in ("", None)}
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else None
+
+
+def import_catalog(session_factory, table: str, lines: Iterable[str], fmt: str, chunk_size: int, max_errors: int) -> ImportReport:
+    spec = IMPORT_SPECS[table]
+    report = ImportReport(max_errors)
+    chunk = {}
+    try:
+        with session_factory() as db:
+            for line, record in read_records(lines, fmt):
+                report.rows += 1
+                if record is None:
+                    report.error(line, "Malformed record")
+                    continue
+                try:
+                    values = spec.schema.model_validate(record).model_dump()
+                except ValidationError as error:
+                    report.error(
+                        line,
+                        error.errors(include_url=False, include_context=False, include_input=False),
+                    )
+                    continue
+                # A later row for the same key wins
+                chunk[tuple(values[k] for k in spec.key)] = values
+                if len(chunk) >= chunk_size:
+                    _upsert(db, spec, chunk, report)
+                    chunk = {}
+            if chunk:
+                _upsert(db, spec, chunk, report)
+    finally:
+        # One version bump for the whole import, not one per row
+        if report.inserted or report.updated:
+            catalog_cache.invalidate(table)
+    return report
+
+
+def _upsert(db, spec: ImportSpec, chunk: dict, report: ImportReport):
+    model = spec.model
+    key_columns = [getattr(model, k) for k in spec.key]
+    # The first key column narrows the candidates through the natural key
+    # index; the rest are matched here
+    candidates = db.execute(
+        select(model.id, *key_columns)
+        .where(key_columns[0].in_(list({key[0] for key in chunk})))
+        .order_by(model.id)
+    ).all()
+    existing = {}
+    for row in candidates:
+        existing.setdefault(tuple(row[1:]), row.id)
+
+    updates, inserts = [], []
+    for key, values in chunk.items():
+        if key in existing:
+            updates.append({"id": existing[key], **values})
+        else:
+            inserts.append(values)
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
+    db.commit()
+    report.updated += len(updates)
+    report.inserted += len(inserts)
@@ -0,0 +1,71 @@
+import logging
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import settings
+from db.session import QueryStats, current_queries
+
+logger = logging.getLogger(__name__)
+
+def debug_headers(stats: QueryStats) -> dict:
+    return {
+        "X-DB-Queries": str(stats.count),
+        "X-DB-Time-Ms": f"{stats.total * 1000:.2f}",
+        "X-DB-Slowest-Ms": f"{stats.slowest * 1000:.2f}",
+    }
+
+
+def slow_request_message(method: str, path: str, elapsed: float, stats: QueryStats) -> str:
+    lines = [
+        f"Slow request {method} {path}: {elapsed * 1000:.1f} ms, {stats.count} queries, "
+        f"{stats.total * 1000:.1f} ms in the database"
+    ]
+    if stats.slowest_statement is not None:
+        lines.append(f"slowest ({stats.slowest * 1000:.1f} ms): {stats.slowest_statement}")
+    lines.extend(f"  {seconds * 1000:8.2f} ms  {statement}" for seconds, statement in stats.statements)
+    if stats.count > len(stats.statements):
+        lines.append(f"  ... {stats.count - len(stats.statements)} more")
+    return "\n".join(lines)
+
+
+class SQLInstrumentationMiddleware:
+    """Counts and times the SQL each request runs.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass
+    straight through. Statements are recorded by the engine hooks in
+    db/session.py through the ``current_queries`` context variable, which
+    sync routes inherit in their threadpool thread.
+    """
+
+    # Called with (method, route path, QueryStats) after every request, e.g.
+    # by the tests' query budget fixture
+    observers = []
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_queries.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADERS:
+                MutableHeaders(scope=message).update(debug_headers(stats))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_queries.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = route.path if route is not None else scope["path"]
+            for observer in self.observers:
+                observer(scope["method"], path, stats)
+            if settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+                logger.warning(slow_request_message(scope["method"], path, elapsed, stats))
@@ -1,23 +1,52 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Query, BackgroundTasks
-from typing import List, Annotated
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, status, Query, BackgroundTasks, Request, Response
+from typing import List, Annotated, Literal
+from contextlib import asynccontextmanager
 from schemas import *
 import auth as auth
 from auth import (
     authenticate_user,
     create_access_token,
-    bcrypt_context,
     oauth2_bearer,
     create_refresh_token,
 )
 from fastapi_mail import FastMail, MessageSchema
-from datetime import datetime, timedelta, UTC
-from config import conf
+from datetime import date, datetime, timedelta, UTC
+from config import conf, settings
+from hashing import password_hasher
+from instrumentation import SQLInstrumentationMiddleware
+from metrics import MetricsMiddleware
+from profiler import ProfilerMiddleware
+from pagination import page_dependency
+from subscription_cache import list_key, render, subscription_cache
+from catalog import catalog_cache
+from conditional import not_modified
+from fastjson import trusted_response
+from pricing import calculate_price, price_matrix_cache
 import secrets
-from jose import jwt
+from jose import JWTError, jwt
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from token_cache import token_digest
+import asyncio
+import io
+import os
+import logging
+from operator import itemgetter
+import tempfile
 
 
 import models as models
-from db.session import SessionLocal, engine
+import bulk
+import expiry
+import exporter
+import importer
+import metrics
+import profiler
+import queries
+import tracing
+from db.session import SessionLocal, engine, pool_stats
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from schemas.user import UserCreate, UserOut, UserLogin
 from schemas.magazine import Magazine, MagazineCreate, MagazineUpdate
@@ -29,10 +58,80 @@ from schemas.subscription import (
 )
 from schemas.tokens import Token
 
-app = FastAPI()
-app.include_router(auth.router)
+logger = logging.getLogger(__name__)
+
+
+# Pick up tokens/users revoked by other workers
+async def refresh_revocations():
+    while True:
+        await asyncio.sleep(settings.REVOCATION_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(auth.revocation_list.refresh)
+        except Exception:
+            logger.exception("Refreshing the revocation list failed")
+
+
+# Deactivate subscriptions that lapsed past the grace period
+async def sweep_expired_subscriptions():
+    while True:
+        await asyncio.sleep(settings.EXPIRY_SWEEP_INTERVAL_SECONDS)
+        try:
+            report = await run_in_threadpool(
+                expiry.sweep_expired,
+                SessionLocal,
+                date.today(),
+                settings.EXPIRY_GRACE_DAYS,
+                settings.EXPIRY_CHUNK_SIZE,
+            )
+        except Exception:
+            logger.exception("Expiry sweep failed")
+            continue
+        if report.expired:
+            logger.info("Expiry sweep: %s", report.as_dict())
+
+
+# Keep this worker's share of the multiprocess metrics current between scrapes
+async def refresh_metrics():
+    while True:
+        await asyncio.sleep(settings.METRICS_REFRESH_SECONDS)
+        try:
+            metrics.refresh()
+        except Exception:
+            logger.exception("Refreshing metrics failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(auth.revocation_list.rebuild)
+    tasks = [asyncio.create_task(refresh_revocations())]
+    if settings.EXPIRY_SWEEP_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(sweep_expired_subscriptions()))
+    if metrics.MULTIPROCESS and settings.METRICS_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(refresh_metrics()))
+    yield
+    for task in tasks:
+        task.cancel()
+    if metrics.MULTIPROCESS:
+        metrics.refresh()
+    password_hasher.shutdown()
+    tracing.flush()
+    if app.state.async_db:
+        from db.async_session import async_engine
+
+        await async_engine.dispose()
+
+
+if settings.TRACING_ENABLED:
+    tracing.configure()
+
 models.Base.metadata.create_all(bind=engine)
 
+# Routes that talk to the database. With ASYNC_DB the async_routes variants
+# are mounted instead (see create_app at the bottom of this module).
+router = APIRouter()
+# Admin, internal and token routes, mounted either way
+internal_router = APIRouter()
+
 
 # Dependency to get DB session
 def get_db():
@@ -43,13 +142,9 @@ def get_db():
         db.close()
 
 
-# Calculate subscription price
-def calculate_price(magazine_base_price: float, plan_discount: float) -> float:
-    return magazine_base_price * (1 - plan_discount)
-
-
 db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(auth.get_current_user)]
+admin_dependency = Annotated[dict, Depends(auth.get_admin_user)]
 
 
 ##############################################################################################################
@@ -57,28 +152,40 @@ user_dependency = Annotated[dict, Depends(auth.get_current_user)]
 
 
 # Register user
-@app.post(
+@router.post(
     "/users/register",
     response_model=UserOut,
     status_code=status.HTTP_200_OK,
     tags=["users"],
 )
-def register_user(user: UserCreate, db: db_dependency):
-    db_user = (
-        db.query(models.User)
-        .filter(
-            (models.User.username == user.username) | (models.User.email == user.email)
-        )
-        .first()
-    )
-    if db_user:
+async def register_user(user: UserCreate, db: db_dependency):
+    # The queries run in the threadpool and only the bcrypt hash is awaited
+    # here, so neither blocks the event loop
+    if await run_in_threadpool(user_exists, db, user.username, user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered",
         )
+    hashed_password = await password_hasher.hash(user.password)
+    return await run_in_threadpool(insert_user, db, user, hashed_password)
+
+
+def user_exists(db: Session, username: str, email: str) -> bool:
+    exists = (
+        db.query(models.User.id)
+        .filter((models.User.username == username) | (models.User.email == email))
+        .first()
+        is not None
+    )
+    # Don't hold a pooled connection while waiting on the hash pool
+    db.close()
+    return exists
+
+
+def insert_user(db: Session, user: UserCreate, hashed_password: str) -> dict:
     new_user = models.User(
         username=user.username,
-        hashed_password=bcrypt_context.hash(user.password),
+        hashed_password=hashed_password,
         email=user.email,
         is_active=True,
     )
@@ -89,9 +196,9 @@ def register_user(user: UserCreate, db: db_dependency):
 
 
 # Login user
-@app.post("/users/login", response_model=Token, tags=["users"])
+@router.post("/users/login", response_model=Token, tags=["users"])
 async def login_user(login_request: UserLogin, db: db_dependency):
-    user = authenticate_user(db, login_request.username, login_request.password)
+    user = await authenticate_user(db, login_request.username, login_request.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
@@ -113,7 +220,7 @@ async def login_user(login_request: UserLogin, db: db_dependency):
 
 
 # Reset password
-@app.post("/users/reset-password", status_code=status.HTTP_200_OK, tags=["users"])
+@router.post("/users/reset-password", status_code=status.HTTP_200_OK, tags=["users"])
 async def reset_password(
     background_tasks: BackgroundTasks,
     db: db_dependency,
@@ -134,7 +241,7 @@ async def reset_password(
 
 
 # Deactivate a user
-@app.delete(
+@router.delete(
     "/users/deactivate/{username}", status_code=status.HTTP_200_OK, tags=["users"]
 )
 def deactivate_user(username: str, db: db_dependency, current_user: user_dependency):
@@ -144,60 +251,189 @@ def deactivate_user(username: str, db: db_dependency, current_user: user_depende
 
     user.is_active = False
     db.commit()
+    auth.revocation_list.revoke_user(db, user.id)
+    auth.token_cache.invalidate_user(user.id)
     return {"message": "User deactivated successfully"}
 
 
-# Refresh token
-@app.post("/users/token/refresh", response_model=Token, tags=["users"])
-async def refresh_token(
-    token: Annotated[str, Depends(oauth2_bearer)], db: db_dependency
-):
-    try:
-        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")
-        if username is None or user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
-            )
+# Connection pool checkout/wait statistics, for sizing workers
+@internal_router.get("/internal/db-pool", tags=["internal"])
+def db_pool_stats(admin: admin_dependency):
+    return pool_stats.snapshot()
 
-        # Verify user exists and is active
-        user = (
-            db.query(models.User)
-            .filter(models.User.username == username, models.User.id == user_id)
-            .first()
+
+# Catalog cache hit/miss/rebuild counters and table versions
+@internal_router.get("/internal/catalog-cache", tags=["internal"])
+def catalog_cache_stats(admin: admin_dependency):
+    return catalog_cache.stats()
+
+
+# Subscription list cache size, hit/miss and eviction counters
+@internal_router.get("/internal/subscription-cache", tags=["internal"])
+def subscription_cache_stats(admin: admin_dependency):
+    return subscription_cache.stats()
+
+
+# Prometheus scrape target; unauthenticated, so keep it off public ingress
+@internal_router.get("/metrics", tags=["internal"], include_in_schema=False)
+async def prometheus_metrics():
+    metrics.refresh()
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+# Stream a CSV or NDJSON file of magazines or plans into the catalog,
+# upserting on the natural key. The body is spooled to a temporary file (on
+# disk past 1 MB) and imported from there in a worker thread.
+@internal_router.post("/admin/import/{table}", tags=["admin"])
+async def import_catalog(
+    table: Literal["magazines", "plans"],
+    request: Request,
+    admin: admin_dependency,
+    format: Literal["csv", "ndjson"] | None = None,
+):
+    fmt = format or importer.format_for(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass ?format=",
         )
-        if not user or not user.is_active:
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        lines = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        try:
+            report = await run_in_threadpool(
+                importer.import_catalog,
+                SessionLocal,
+                table,
+                lines,
+                fmt,
+                settings.IMPORT_CHUNK_SIZE,
+                settings.IMPORT_MAX_ERRORS,
+            )
+        except UnicodeDecodeError:
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found or inactive",
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be UTF-8"
             )
+        finally:
+            lines.detach()
+    return report.as_dict()
+
+
+# Stream subscriptions as NDJSON or CSV, optionally gzipped. The generator
+# runs in the threadpool and holds one connection for the whole download.
+@internal_router.get("/admin/export/subscriptions", tags=["admin"])
+def export_subscriptions(
+    admin: admin_dependency,
+    filters: queries.subscription_filters_dependency,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+):
+    filename = f"subscriptions.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        exporter.export_subscriptions(
+            SessionLocal, format, filters, gzip, settings.EXPORT_BATCH_SIZE
+        ),
+        media_type="application/gzip" if gzip else exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-        # Create new tokens
-        access_token = create_access_token(
-            username, user_id, expires_delta=timedelta(minutes=15)
-        )
-        refresh_token = create_refresh_token(
-            username, user_id, expires_delta=timedelta(days=7)
+
+# Sample every thread of this worker for `seconds` and return the stacks as
+# collapsed text or speedscope JSON, for flamegraphs
+@internal_router.get("/admin/profile", tags=["admin"])
+async def profile_worker(
+    admin: admin_dependency,
+    seconds: float = Query(10.0, gt=0),
+    format: Literal["collapsed", "speedscope"] = "collapsed",
+    include_idle: bool = False,
+):
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is disabled")
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"seconds must be at most {settings.PROFILER_MAX_SECONDS:g}",
         )
+    sampler = profiler.StackSampler(settings.PROFILER_INTERVAL_MS / 1000, include_idle)
+    try:
+        sampler.start()
+    except RuntimeError as error:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        result = await sampler.stop_async()
+    body, content_type = result.render(format, f"worker {os.getpid()}")
+    return Response(
+        content=body,
+        media_type=content_type,
+        headers={"X-Profile-Samples": str(result.samples)},
+    )
 
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer",
-        }
+
+# Refresh token
+@internal_router.post("/users/token/refresh", response_model=Token, tags=["users"])
+async def refresh_token(token: Annotated[str, Depends(oauth2_bearer)]):
+    try:
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
         )
-    except jwt.PyJWTError:
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
+        )
+    username: str = payload.get("sub")
+    user_id: int = payload.get("id")
+    if username is None or user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         )
 
+    # Deactivated users and logged-out tokens are on the revocation list
+    if await auth.is_revoked(token_digest(token), user_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found or inactive",
+        )
+
+    # Create new tokens
+    access_token = create_access_token(
+        username, user_id, expires_delta=timedelta(minutes=15)
+    )
+    refresh_token = create_refresh_token(
+        username, user_id, expires_delta=timedelta(days=7)
+    )
+
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+# Logout: revoke the presented token
+@router.post("/users/logout", status_code=status.HTTP_200_OK, tags=["users"])
+def logout_user(
+    token: Annotated[str, Depends(oauth2_bearer)],
+    db: db_dependency,
+    current_user: user_dependency,
+):
+    payload = jwt.get_unverified_claims(token)
+    digest = token_digest(token)
+    auth.revocation_list.revoke_token(
+        db, digest, current_user["user_id"], payload["exp"]
+    )
+    auth.token_cache.invalidate_user(current_user["user_id"])
+    return {"message": "Logged out successfully"}
+
 
 # Get current user
-@app.get(
+@router.get(
     "/users/me", response_model=UserOut, status_code=status.HTTP_200_OK, tags=["users"]
 )
 def user(user: user_dependency, db: db_dependency):
@@ -213,16 +449,16 @@ def user(user: user_dependency, db: db_dependency):
 
 
 # Get all magazines
-@app.get("/magazines/", response_model=List[Magazine], tags=["magazines"])
-def get_magazines(db: db_dependency):
-    magazines = db.query(models.Magazine).all()
-    if magazines is None:
-        raise HTTPException(status_code=404, detail="Magazines not found")
-    return magazines
+@router.get("/magazines/", response_model=List[Magazine], tags=["magazines"])
+def get_magazines(db: db_dependency, page: page_dependency):
+    magazines = catalog_cache.get("magazines", db)
+    return not_modified(page.request, page.response, magazines) or trusted_response(
+        page.slice(magazines.items, magazines.ids), page.response
+    )
 
 
 # Create a new magazine
-@app.post("/magazines/", response_model=Magazine, tags=["magazines"])
+@router.post("/magazines/", response_model=Magazine, tags=["magazines"])
 def create_magazine(magazine: MagazineCreate, db: db_dependency):
     db_magazine = models.Magazine(
         name=magazine.name,
@@ -232,22 +468,24 @@ def create_magazine(magazine: MagazineCreate, db: db_dependency):
     db.add(db_magazine)
     db.commit()
     db.refresh(db_magazine)
+    catalog_cache.invalidate("magazines")
     return db_magazine
 
 
 # Get a specific magazine
-@app.get("/magazines/{magazine_id}", response_model=Magazine, tags=["magazines"])
-def get_magazine(magazine_id: int, db: db_dependency):
-    magazine = (
-        db.query(models.Magazine).filter(models.Magazine.id == magazine_id).first()
-    )
+@router.get("/magazines/{magazine_id}", response_model=Magazine, tags=["magazines"])
+def get_magazine(
+    magazine_id: int, db: db_dependency, request: Request, response: Response
+):
+    magazine = catalog_cache.lookup("magazines", db, magazine_id)
     if magazine is None:
         raise HTTPException(status_code=404, detail="Magazine not found")
-    return magazine
+    magazines = catalog_cache.get("magazines", db)
+    return not_modified(request, response, magazines) or magazine
 
 
 # Update a magazine
-@app.put("/magazines/{magazine_id}", response_model=Magazine, tags=["magazines"])
+@router.put("/magazines/{magazine_id}", response_model=Magazine, tags=["magazines"])
 def update_magazine(magazine_id: int, magazine: MagazineUpdate, db: db_dependency):
     db_magazine = (
         db.query(models.Magazine).filter(models.Magazine.id == magazine_id).first()
@@ -259,11 +497,12 @@ def update_magazine(magazine_id: int, magazine: MagazineUpdate, db: db_dependenc
     db_magazine.base_price = magazine.base_price
     db.commit()
     db.refresh(db_magazine)
+    catalog_cache.invalidate("magazines")
     return db_magazine
 
 
 # Delete a magazine
-@app.delete("/magazines/{magazine_id}", tags=["magazines"])
+@router.delete("/magazines/{magazine_id}", tags=["magazines"])
 def delete_magazine(magazine_id: int, db: db_dependency):
     db_magazine = (
         db.query(models.Magazine).filter(models.Magazine.id == magazine_id).first()
@@ -272,6 +511,7 @@ def delete_magazine(magazine_id: int, db: db_dependency):
         raise HTTPException(status_code=404, detail="Magazine not found")
     db.delete(db_magazine)
     db.commit()
+    catalog_cache.invalidate("magazines")
     return {"message": "Magazine deleted successfully"}
 
 
@@ -280,16 +520,16 @@ def delete_magazine(magazine_id: int, db: db_dependency):
 
 
 # Get all plans
-@app.get("/plans/", response_model=List[Plan], tags=["plans"])
-def get_plans(db: db_dependency):
-    plans = db.query(models.Plan).all()
-    if plans is None:
-        raise HTTPException(status_code=404, detail="Plans not found")
-    return plans
+@router.get("/plans/", response_model=List[Plan], tags=["plans"])
+def get_plans(db: db_dependency, page: page_dependency):
+    plans = catalog_cache.get("plans", db)
+    return not_modified(page.request, page.response, plans) or trusted_response(
+        page.slice(plans.items, plans.ids), page.response
+    )
 
 
 # Create a new plan
-@app.post("/plans/", response_model=Plan, tags=["plans"])
+@router.post("/plans/", response_model=Plan, tags=["plans"])
 def create_plan(plan: PlanCreate, db: db_dependency):
     db_plan = models.Plan(
         title=plan.title,
@@ -301,20 +541,22 @@ def create_plan(plan: PlanCreate, db: db_dependency):
     db.add(db_plan)
     db.commit()
     db.refresh(db_plan)
+    catalog_cache.invalidate("plans")
     return db_plan
 
 
 # Get a specific plan
-@app.get("/plans/{plan_id}", response_model=Plan, tags=["plans"])
-def get_plan(plan_id: int, db: db_dependency):
-    plan = db.query(models.Plan).filter(models.Plan.id == plan_id).first()
+@router.get("/plans/{plan_id}", response_model=Plan, tags=["plans"])
+def get_plan(plan_id: int, db: db_dependency, request: Request, response: Response):
+    plan = catalog_cache.lookup("plans", db, plan_id)
     if plan is None:
         raise HTTPException(status_code=404, detail="Plan not found")
-    return plan
+    plans = catalog_cache.get("plans", db)
+    return not_modified(request, response, plans) or plan
 
 
 # Update a plan
-@app.put("/plans/{plan_id}", response_model=Plan, tags=["plans"])
+@router.put("/plans/{plan_id}", response_model=Plan, tags=["plans"])
 def update_plan(plan_id: int, plan: PlanUpdate, db: db_dependency):
     db_plan = db.query(models.Plan).filter(models.Plan.id == plan_id).first()
     if db_plan is None:
@@ -326,102 +568,193 @@ def update_plan(plan_id: int, plan: PlanUpdate, db: db_dependency):
     db_plan.discount = plan.discount
     db.commit()
     db.refresh(db_plan)
+    catalog_cache.invalidate("plans")
     return db_plan
 
 
 # Delete a plan
-@app.delete("/plans/{plan_id}", tags=["plans"])
+@router.delete("/plans/{plan_id}", tags=["plans"])
 def delete_plan(plan_id: int, db: db_dependency):
     db_plan = db.query(models.Plan).filter(models.Plan.id == plan_id).first()
     if db_plan is None:
         raise HTTPException(status_code=404, detail="Plan not found")
     db.delete(db_plan)
     db.commit()
+    catalog_cache.invalidate("plans")
     return {"message": "Plan deleted successfully"}
 
 
+##############################################################################################################
+# Pricing
+
+
+# Price of every magazine under every plan, optionally narrowed to some
+# magazines and/or plan tiers
+@router.get("/pricing/matrix", tags=["pricing"])
+def get_price_matrix(
+    db: db_dependency,
+    magazine_ids: Annotated[list[int] | None, Query()] = None,
+    tiers: Annotated[list[int] | None, Query()] = None,
+):
+    matrix = price_matrix_cache.get(
+        catalog_cache.get("magazines", db), catalog_cache.get("plans", db)
+    )
+    if magazine_ids or tiers:
+        matrix = matrix.select(magazine_ids, tiers)
+    return Response(content=matrix.body, media_type="application/json")
+
+
 ##############################################################################################################
 # Subscriptions
 
 
-# Get all subscriptions for the current user
-@app.get("/subscriptions/", response_model=List[Subscription], tags=["subscriptions"])
-def get_subscriptions(db: db_dependency, current_user: user_dependency):
-    subscriptions = (
-        db.query(models.Subscription)
-        .filter(
-            models.Subscription.user_id
-            == current_user["user_id"]
-            # models.Subscription.is_active == True,
-        )
-        .all()
+# Get all subscriptions for the current user; the serialized page is cached
+# per user until one of their subscriptions changes
+@router.get("/subscriptions/", response_model=List[Subscription], tags=["subscriptions"])
+def get_subscriptions(
+    request: Request,
+    db: db_dependency,
+    current_user: user_dependency,
+    page: page_dependency,
+    filters: queries.subscription_filters_dependency,
+):
+    user_id, key = current_user["user_id"], list_key(request)
+    cached = subscription_cache.get(user_id, key)
+    if cached is not None:
+        return cached.response()
+    ticket = subscription_cache.ticket()
+    statement = select(*queries.SUBSCRIPTION_COLUMNS).where(
+        models.Subscription.user_id == user_id, *filters
     )
-    return subscriptions
+    rows = db.execute(page.apply(statement, models.Subscription.id)).mappings().all()
+    entry = render(page.finish(rows, key=itemgetter("id")), page.response)
+    subscription_cache.put(user_id, key, entry, ticket)
+    return entry.response()
 
 
 # Create a new subscription for the current user
-@app.post("/subscriptions/", response_model=None, tags=["subscriptions"])
+@router.post("/subscriptions/", response_model=None, tags=["subscriptions"])
 def create_subscription(
     subscription: SubscriptionCreate, db: db_dependency, current_user: user_dependency
 ):
-    existing_subscription = (
-        db.query(models.Subscription)
-        .filter(
-            models.Subscription.user_id == current_user["user_id"],
-            models.Subscription.magazine_id == subscription.magazine_id,
-            models.Subscription.plan_id == subscription.plan_id,
-            models.Subscription.is_active == True,
-        )
-        .first()
-    )
-
-    if existing_subscription:
+    magazine = catalog_cache.lookup("magazines", db, subscription.magazine_id)
+    plan = catalog_cache.lookup("plans", db, subscription.plan_id)
+    if magazine is None or plan is None:
         raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Active subscription already exists",
+            status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
         )
 
-    magazine = (
-        db.query(models.Magazine)
-        .filter(models.Magazine.id == subscription.magazine_id)
-        .first()
-    )
-    plan = db.query(models.Plan).filter(models.Plan.id == subscription.plan_id).first()
+    price = models.check_price(calculate_price(magazine["base_price"], plan["discount"]))
 
-    if not magazine or not plan:
+    # Duplicates are rejected by the partial unique index rather than a
+    # pre-check SELECT
+    try:
+        new_subscription = db.execute(
+            queries.insert_subscription(
+                user_id=current_user["user_id"],
+                magazine_id=subscription.magazine_id,
+                plan_id=subscription.plan_id,
+                price=price,
+                renewal_date=subscription.renewal_date,
+                is_active=True,
+            )
+        ).mappings().one()
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        if queries.is_foreign_key_violation(error):
+            # Deleted by another worker since our catalog snapshot
+            catalog_cache.clear()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+            )
+        if not queries.is_active_subscription_conflict(error):
+            raise
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Active subscription already exists",
         )
+    subscription_cache.invalidate_user(current_user["user_id"])
+    return dict(new_subscription)
 
-    price = calculate_price(magazine.base_price, plan.discount)
 
-    new_subscription = models.Subscription(
-        user_id=current_user["user_id"],
-        magazine_id=subscription.magazine_id,
-        plan_id=subscription.plan_id,
-        price=price,
-        renewal_date=subscription.renewal_date,
-        is_active=True,
+# Create many subscriptions for the current user from a JSON array or an
+# NDJSON stream; every item gets its own result instead of failing the batch
+@router.post("/subscriptions/bulk", tags=["subscriptions"])
+async def create_subscriptions_bulk(
+    request: Request, db: db_dependency, current_user: user_dependency
+):
+    results, taken = [], set()
+    chunks = bulk.read_chunks(
+        request, settings.BULK_CHUNK_SIZE, settings.BULK_MAX_ITEMS, settings.BULK_MAX_JSON_BYTES
     )
-
-    db.add(new_subscription)
-    db.commit()
-    db.refresh(new_subscription)
-    return new_subscription
+    try:
+        async for chunk in chunks:
+            await run_in_threadpool(
+                create_subscription_chunk, db, current_user["user_id"], chunk, taken
+            )
+            results.extend(item.result for item in chunk)
+    finally:
+        subscription_cache.invalidate_user(current_user["user_id"])
+    return bulk.summary(results)
+
+
+def create_subscription_chunk(db: Session, user_id: int, chunk: list, taken: set):
+    magazine_ids, plan_ids = bulk.catalog_ids(chunk)
+    if not magazine_ids:
+        return
+    magazines = catalog_cache.lookup_many("magazines", db, magazine_ids)
+    plans = catalog_cache.lookup_many("plans", db, plan_ids)
+    if magazines:
+        pairs = db.execute(queries.active_subscription_pairs(user_id, list(magazines)))
+        taken.update(tuple(pair) for pair in pairs)
+    items = bulk.plan_chunk(chunk, user_id, magazines, plans, taken)
+    if not items:
+        return
+    try:
+        rows = db.execute(
+            queries.insert_subscriptions(), [item.values for item in items]
+        ).mappings().all()
+        db.commit()
+    except IntegrityError:
+        # A concurrent request got in first; retry one row at a time
+        db.rollback()
+        for item in items:
+            try:
+                row = db.execute(queries.insert_subscription(**item.values)).mappings().one()
+                db.commit()
+            except IntegrityError as error:
+                db.rollback()
+                bulk.resolve_conflict(item, error)
+            else:
+                item.resolve("created", subscription=dict(row))
+        return
+    for item, row in zip(items, rows):
+        item.resolve("created", subscription=dict(row))
 
 
 # Get a specific subscription for the current user
-@app.get("/subscriptions/{id}", response_model=Subscription, tags=["subscriptions"])
-def get_subscription(id: int, db: db_dependency):
+@router.get("/subscriptions/{id}", response_model=Subscription, tags=["subscriptions"])
+def get_subscription(id: int, db: db_dependency, current_user: user_dependency):
     subscription = (
         db.query(models.Subscription)
         .filter(
-            models.Subscription.id
-            == id
+            models.Subscription.id == id,
+            models.Subscription.user_id == current_user["user_id"],
             #  models.Subscription.is_active == True
         )
         .first()
     )
+    if not subscription:
+        # History moved out of the hot table by archive.py
+        subscription = (
+            db.query(models.SubscriptionArchive)
+            .filter(
+                models.SubscriptionArchive.id == id,
+                models.SubscriptionArchive.user_id == current_user["user_id"],
+            )
+            .first()
+        )
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found"
@@ -429,8 +762,9 @@ def get_subscription(id: int, db: db_dependency):
     return subscription
 
 
-# Update a subscription for the current user
-@app.put(
+# Modify a subscription: deactivate it and create its replacement, re-priced
+# from the catalog, in one transaction
+@router.put(
     "/subscriptions/{subscription_id}",
     response_model=Subscription,
     tags=["subscriptions"],
@@ -441,31 +775,64 @@ def update_subscription(
     db: db_dependency,
     current_user: user_dependency,
 ):
-    subscription = (
-        db.query(models.Subscription)
-        .filter(
-            models.Subscription.id
-            == subscription_id
-            # models.Subscription.user_id == current_user["user_id"],
-        )
-        .first()
-    )
-    if not subscription:
+    magazine = catalog_cache.lookup("magazines", db, subscription_update.magazine_id)
+    plan = catalog_cache.lookup("plans", db, subscription_update.plan_id)
+    if magazine is None or plan is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found"
+            status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
         )
+    price = models.check_price(calculate_price(magazine["base_price"], plan["discount"]))
 
-    subscription.magazine_id = subscription_update.magazine_id
-    subscription.plan_id = subscription_update.plan_id
-    subscription.renewal_date = subscription_update.renewal_date
+    # The guarded UPDATE runs first, so the row is only locked for the
+    # length of this transaction and a concurrent modify gets a 409
+    user_id = db.execute(
+        queries.retire_subscription(
+            subscription_id, current_user["user_id"], subscription_update.version
+        )
+    ).scalar()
+    if user_id is None:
+        db.rollback()
+        subscription = db.get(models.Subscription, subscription_id)
+        if subscription is None or subscription.user_id != current_user["user_id"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Subscription not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Subscription was modified concurrently",
+        )
 
-    db.commit()
-    db.refresh(subscription)
-    return subscription
+    try:
+        new_subscription = db.execute(
+            queries.insert_subscription(
+                user_id=user_id,
+                magazine_id=subscription_update.magazine_id,
+                plan_id=subscription_update.plan_id,
+                price=price,
+                renewal_date=subscription_update.renewal_date,
+                is_active=True,
+            )
+        ).mappings().one()
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        if queries.is_foreign_key_violation(error):
+            catalog_cache.clear()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Magazine or Plan not found"
+            )
+        if not queries.is_active_subscription_conflict(error):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Active subscription already exists",
+        )
+    subscription_cache.invalidate_user(user_id)
+    return dict(new_subscription)
 
 
 # Deactivate a subscription for the current user
-@app.delete(
+@router.delete(
     "/subscriptions/{subscription_id}",
     response_model=Subscription,
     tags=["subscriptions"],
@@ -487,6 +854,31 @@ def delete_subscription(
         )
 
     subscription.is_active = False
+    subscription.version = models.Subscription.version + 1
     db.commit()
+    subscription_cache.invalidate_user(current_user["user_id"])
     db.refresh(subscription)
     return subscription
+
+
+def create_app(async_db: bool = settings.ASYNC_DB) -> FastAPI:
+    # Prometheus covers metrics (see metrics.py); FastAPI's built-in
+    # OpenTelemetry support only records spans, once tracing.configure()
+    # installs a provider
+    app = FastAPI(lifespan=lifespan, telemetry={"metrics": False, "logs": False})
+    app.state.async_db = async_db
+    app.add_middleware(SQLInstrumentationMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(ProfilerMiddleware)
+    app.include_router(auth.router)
+    app.include_router(internal_router)
+    if async_db:
+        from async_routes import router as async_router
+
+        app.include_router(async_router)
+    else:
+        app.include_router(router)
+    return app
+
+
+app = create_app()
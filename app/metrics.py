@@ -0,0 +1,197 @@
+import os
+import time
+from bisect import bisect_left
+import anyio.to_thread
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import auth as auth
+from catalog import catalog_cache
+from db.session import pool_stats
+from hashing import password_hasher
+from subscription_cache import subscription_cache
+
+# Prometheus metrics for GET /metrics.
+#
+# Under gunicorn, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+# before the workers start: every worker then writes its samples to
+# memory-mapped files there, and whichever worker serves the scrape adds
+# them all up (see gunicorn.conf.py for cleaning up after dead workers).
+#
+# Writing a sample costs a lock and, in multiprocess mode, a write to the
+# memory-mapped file, so nothing is written per request: MetricsMiddleware
+# tallies requests in plain Python objects, and each worker copies them,
+# along with its pool, threadpool, bcrypt and cache state, into these metrics every
+# METRICS_REFRESH_SECONDS and right before serving a scrape.
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+class _TalliedHistogram(Histogram):
+    def add(self, total: float, bucket_counts: list[int]):
+        """Record observations already sorted into this histogram's buckets."""
+        self._sum.inc(total)
+        for bucket, count in zip(self._buckets, bucket_counts):
+            if count:
+                bucket.inc(count)
+
+
+# Its _count series, split by status, doubles as the request counter
+BUCKETS = Histogram.DEFAULT_BUCKETS
+REQUEST_LATENCY = _TalliedHistogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ["method", "route", "status"],
+    buckets=BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being served", multiprocess_mode="livesum"
+)
+
+POOL_SIZE = Gauge("db_pool_size", "Pool size", ["pool"], multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out", ["pool"], multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", ["pool"], multiprocess_mode="livesum"
+)
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connection checkouts")
+POOL_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that timed out")
+
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads", "Threadpool threads running sync routes", multiprocess_mode="livesum"
+)
+THREADPOOL_LIMIT = Gauge(
+    "threadpool_max_threads", "Threadpool size", multiprocess_mode="livesum"
+)
+THREADPOOL_WAITING = Gauge(
+    "threadpool_waiting_tasks", "Sync routes waiting for a thread", multiprocess_mode="livesum"
+)
+
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight", "bcrypt hashes and checks running or queued", multiprocess_mode="livesum"
+)
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "bcrypt work waiting for a hashing worker", multiprocess_mode="livesum"
+)
+
+CACHE_HITS = Counter("cache_hits_total", "In-process cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "In-process cache misses", ["cache"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "In-process cache evictions", ["cache"])
+CACHE_ENTRIES = Gauge("cache_entries", "In-process cache entries", ["cache"], multiprocess_mode="livesum")
+CACHE_BYTES = Gauge("cache_bytes", "In-process cache size in bytes", ["cache"], multiprocess_mode="livesum")
+
+
+class MetricsMiddleware:
+    """Tallies latency per route and status, and the requests in flight.
+
+    The tallies are only touched on the event loop thread, as is refresh(),
+    which drains them, so they need no lock. The route label is the matched
+    path template, or "unmatched", never the raw path.
+    """
+
+    in_flight = 0
+    # (method, route, status) -> [latency total, count per bucket]
+    pending = {}
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        MetricsMiddleware.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            MetricsMiddleware.in_flight -= 1
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched", status)
+            tally = MetricsMiddleware.pending.get(key)
+            if tally is None:
+                tally = MetricsMiddleware.pending[key] = [0.0, [0] * len(BUCKETS)]
+            tally[0] += elapsed
+            tally[1][bisect_left(BUCKETS, elapsed)] += 1
+
+
+# Last cumulative value copied into each Counter, so refresh() adds deltas
+_copied = {}
+
+
+def _copy_count(counter, value, *labels):
+    key = (counter, labels)
+    delta = value - _copied.get(key, 0)
+    # Calling labels() also exports caches that have not been used yet, as 0
+    child = counter.labels(*labels) if labels else counter
+    if delta > 0:
+        child.inc(delta)
+    _copied[key] = value
+
+
+def refresh():
+    """Copy this process's in-flight, pool, threadpool, bcrypt and cache state into the metrics.
+
+    Must run on the event loop (the threadpool limiter belongs to it).
+    """
+    pending, MetricsMiddleware.pending = MetricsMiddleware.pending, {}
+    for key, (total, bucket_counts) in pending.items():
+        REQUEST_LATENCY.labels(*key).add(total, bucket_counts)
+    IN_FLIGHT.set(MetricsMiddleware.in_flight)
+
+    stats = pool_stats.snapshot()
+    _copy_count(POOL_CHECKOUTS, stats["checkouts"])
+    _copy_count(POOL_TIMEOUTS, stats["timeouts"])
+    for pool in stats["pools"]:
+        POOL_SIZE.labels(pool["name"]).set(pool["size"])
+        POOL_CHECKED_OUT.labels(pool["name"]).set(pool["checked_out"])
+        POOL_OVERFLOW.labels(pool["name"]).set(max(pool["overflow"], 0))
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY.set(limiter.borrowed_tokens)
+    THREADPOOL_LIMIT.set(limiter.total_tokens)
+    THREADPOOL_WAITING.set(limiter.statistics().tasks_waiting)
+
+    hashing = password_hasher.stats()
+    PASSWORD_HASH_IN_FLIGHT.set(hashing["in_flight"])
+    PASSWORD_HASH_QUEUE_DEPTH.set(hashing["queue_depth"])
+
+    catalog = catalog_cache.stats()
+    catalog["entries"] = sum(table["size"] or 0 for table in catalog["tables"].values())
+    lists = subscription_cache.stats()
+    tokens = auth.token_cache.stats()
+    tokens["entries"] = tokens["size"]
+    for name, cache in (("catalog", catalog), ("subscription_list", lists), ("token", tokens)):
+        _copy_count(CACHE_HITS, cache["hits"], name)
+        _copy_count(CACHE_MISSES, cache["misses"], name)
+        _copy_count(CACHE_EVICTIONS, cache.get("evictions", 0), name)
+        CACHE_ENTRIES.labels(name).set(cache["entries"])
+    CACHE_BYTES.labels("subscription_list").set(lists["bytes"])
+
+
+def render() -> tuple[bytes, str]:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
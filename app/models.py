@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from db.base import Base
 from sqlalchemy.orm import validates
@@ -24,6 +24,9 @@ class Magazine(Base):
 
     subscriptions = relationship("Subscription", back_populates="magazine")
 
+    # Natural key for catalog imports
+    __table_args__ = (Index("ix_magazines_name", "name"),)
+
 class Plan(Base):
     __tablename__ = 'plans'
 
@@ -36,6 +39,12 @@ class Plan(Base):
 
     subscriptions = relationship("Subscription", back_populates="plan")
 
+    # Natural key for catalog imports
+    __table_args__ = (Index("ix_plans_title_tier", "title", "tier"),)
+
+ACTIVE_SUBSCRIPTION_INDEX = "uq_subscriptions_active_user_magazine_plan"
+
+
 class Subscription(Base):
     __tablename__ = 'subscriptions'
 
@@ -46,6 +55,36 @@ class Subscription(Base):
     price = Column(Float, nullable=False)
     renewal_date = Column(Date, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped by every write to the row; modifications are guarded on it
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+
+    __table_args__ = (
+        # get_subscriptions: a user's subscriptions in id order
+        Index("ix_subscriptions_user_id_id", "user_id", "id"),
+        # get_subscriptions?is_active=... keyset pages
+        Index("ix_subscriptions_user_id_is_active_id", "user_id", "is_active", "id"),
+        # get_subscriptions?renewal_from=...&renewal_to=...
+        Index("ix_subscriptions_user_id_renewal_date", "user_id", "renewal_date"),
+        # Renewal engine and expiry sweeper: active rows by renewal date
+        Index(
+            "ix_subscriptions_active_renewal_date",
+            "renewal_date",
+            "id",
+            sqlite_where=text("is_active = 1"),
+            postgresql_where=text("is_active"),
+        ),
+        # "One active subscription per magazine and plan", enforced by the DB;
+        # also serves create_subscription's duplicate lookup
+        Index(
+            ACTIVE_SUBSCRIPTION_INDEX,
+            "user_id",
+            "magazine_id",
+            "plan_id",
+            unique=True,
+            sqlite_where=text("is_active = 1"),
+            postgresql_where=text("is_active"),
+        ),
+    )
 
     user = relationship("User", back_populates="subscriptions")  # Add relationship here
     magazine = relationship("Magazine", back_populates="subscriptions")
@@ -53,6 +92,50 @@ class Subscription(Base):
 
     @validates("price")
     def validate_price(self, key, price):
-        if price <= 0:
-            raise HTTPException(status_code=422, detail="Price must be greater than zero")
-        return price
\ No newline at end of file
+        return check_price(price)
+
+
+# Inactive subscriptions moved out of the hot table by archive.py. Rows keep
+# their subscriptions.id, so GET /subscriptions/{id} can fall back here.
+class SubscriptionArchive(Base):
+    __tablename__ = 'subscriptions_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    magazine_id = Column(Integer, ForeignKey('magazines.id'), nullable=False)
+    plan_id = Column(Integer, ForeignKey('plans.id'), nullable=False)
+    price = Column(Float, nullable=False)
+    renewal_date = Column(Date, nullable=False)
+    is_active = Column(Boolean, nullable=False, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # A user's history in id order
+        Index("ix_subscriptions_archive_user_id_id", "user_id", "id"),
+    )
+
+
+# Shared with the Core INSERT paths, which bypass @validates
+def check_price(price):
+    if price <= 0:
+        raise HTTPException(status_code=422, detail="Price must be greater than zero")
+    return price
+
+
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_digest = Column(String, unique=True, nullable=False)  # sha256 hex of the bearer token
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False)
+
+
+class RevokedUser(Base):
+    __tablename__ = 'revoked_users'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), unique=True, nullable=False)
+    revoked_at = Column(DateTime, nullable=False)
@@ -0,0 +1,75 @@
+import base64
+import binascii
+from bisect import bisect_right
+import json
+from operator import itemgetter
+from typing import Annotated
+from fastapi import Depends, HTTPException, Query, Request, Response, status
+from config import settings
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"v": 1, "id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = data["id"]
+        if data.get("v") != 1 or not isinstance(last_id, int):
+            raise ValueError(cursor)
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return last_id
+
+
+class Page:
+    """Keyset (id > cursor) pagination for list routes.
+
+    ``apply`` adds the keyset condition, ordering and a ``limit + 1`` probe to
+    a Query or Select; ``finish`` trims the probe row and, when there is a
+    further page, sets ``X-Next-Cursor`` and a ``Link: rel="next"`` header.
+    """
+
+    def __init__(self, request: Request, response: Response, limit: int, after_id: int | None):
+        self.request = request
+        self.response = response
+        self.limit = limit
+        self.after_id = after_id
+
+    def apply(self, statement, id_column):
+        if self.after_id is not None:
+            statement = statement.filter(id_column > self.after_id)
+        return statement.order_by(id_column).limit(self.limit + 1)
+
+    def slice(self, items, ids):
+        """Page over rows already held in id order, e.g. a catalog snapshot."""
+        start = 0 if self.after_id is None else bisect_right(ids, self.after_id)
+        return self.finish(items[start : start + self.limit + 1], key=itemgetter("id"))
+
+    def finish(self, rows, key=lambda row: row.id):
+        rows = list(rows)
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            next_cursor = encode_cursor(key(rows[-1]))
+            next_url = self.request.url.include_query_params(cursor=next_cursor)
+            self.response.headers["X-Next-Cursor"] = next_cursor
+            self.response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return rows
+
+
+def page_params(
+    request: Request,
+    response: Response,
+    limit: int = Query(
+        settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX, description="Page size"
+    ),
+    cursor: str | None = Query(None, description="X-Next-Cursor from the previous page"),
+) -> Page:
+    after_id = decode_cursor(cursor) if cursor else None
+    return Page(request, response, limit, after_id)
+
+
+page_dependency = Annotated[Page, Depends(page_params)]
@@ -0,0 +1,85 @@
+import json
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+import numpy as np
+
+
+# Calculate subscription price
+def calculate_price(magazine_base_price: float, plan_discount: float) -> float:
+    return magazine_base_price * (1 - plan_discount)
+
+
+@dataclass(frozen=True)
+class PriceMatrix:
+    """``calculate_price`` for every magazine (rows) under every plan (columns)."""
+
+    magazine_ids: np.ndarray
+    plan_ids: np.ndarray
+    plan_tiers: np.ndarray
+    prices: np.ndarray
+
+    @classmethod
+    def build(cls, magazines, plans) -> "PriceMatrix":
+        """Price two catalog snapshots in one broadcast multiply."""
+        base_prices = np.fromiter(
+            (m["base_price"] for m in magazines.items), dtype=np.float64, count=len(magazines.items)
+        )
+        discounts = np.fromiter(
+            (p["discount"] for p in plans.items), dtype=np.float64, count=len(plans.items)
+        )
+        return cls(
+            magazine_ids=np.asarray(magazines.ids, dtype=np.int64),
+            plan_ids=np.asarray(plans.ids, dtype=np.int64),
+            plan_tiers=np.fromiter((p["tier"] for p in plans.items), dtype=np.int64, count=len(plans.items)),
+            # Same float operations as calculate_price, so identical results
+            prices=np.multiply.outer(base_prices, 1 - discounts),
+        )
+
+    def select(self, magazine_ids=None, tiers=None) -> "PriceMatrix":
+        rows = np.isin(self.magazine_ids, magazine_ids) if magazine_ids else slice(None)
+        columns = np.isin(self.plan_tiers, tiers) if tiers else slice(None)
+        return PriceMatrix(
+            magazine_ids=self.magazine_ids[rows],
+            plan_ids=self.plan_ids[columns],
+            plan_tiers=self.plan_tiers[columns],
+            prices=self.prices[rows][:, columns],
+        )
+
+    @cached_property
+    def body(self) -> bytes:
+        return json.dumps(
+            {
+                "magazine_ids": self.magazine_ids.tolist(),
+                "plan_ids": self.plan_ids.tolist(),
+                "prices": self.prices.tolist(),
+            },
+            separators=(",", ":"),
+        ).encode()
+
+
+class PriceMatrixCache:
+    """Keeps the full matrix (and its encoded body) for the current catalog.
+
+    Keyed on the snapshot digests, so any magazine or plan change rebuilds it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._matrix = None
+        self.builds = 0
+
+    def get(self, magazines, plans) -> PriceMatrix:
+        key = (magazines.digest, plans.digest)
+        with self._lock:
+            if self._key == key:
+                return self._matrix
+        matrix = PriceMatrix.build(magazines, plans)
+        with self._lock:
+            self._key, self._matrix = key, matrix
+            self.builds += 1
+        return matrix
+
+
+price_matrix_cache = PriceMatrixCache()
@@ -0,0 +1,236 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+import anyio
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import auth as auth
+from config import settings
+
+# Statistical profiler for a live worker. A background thread snapshots the
+# stack of every other thread (sys._current_frames) every
+# PROFILER_INTERVAL_MS and counts identical stacks; nothing is hooked into
+# the code being profiled, so it only costs the sampler's own time.
+#
+# Results come as collapsed stacks ("thread;outer;...;inner count", the
+# input of flamegraph.pl and most flamegraph viewers) or as speedscope JSON
+# (https://www.speedscope.app), one profile per thread.
+#
+# Only one profile runs at a time per worker, whether started from
+# GET /admin/profile or by a request carrying X-Profile (see
+# ProfilerMiddleware).
+
+FORMATS = ("collapsed", "speedscope")
+
+# Leaf frames of threads parked waiting for work: idle threadpool and bcrypt
+# workers, and the event loop in select()
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+_running = threading.Lock()
+_labels = {}
+
+
+def frame_label(code) -> tuple[str, str, int]:
+    """(function, file, first line) for a code object, with the file relative
+    to the sys.path entry it was imported from."""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for root in sorted(sys.path, key=len, reverse=True):
+            if root and filename.startswith(root + os.sep):
+                filename = filename[len(root) + 1:]
+                break
+        label = _labels[code] = (code.co_qualname, filename, code.co_firstlineno)
+    return label
+
+
+class Profile:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.elapsed = 0.0
+        # (thread name, code objects outermost first) -> times seen
+        self.stacks = Counter()
+
+    def collapsed(self) -> str:
+        lines = []
+        for (thread, codes), count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({file}:{line})" for name, file, line in map(frame_label, codes))
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "profile") -> dict:
+        frames, index = [], {}
+        profiles = {}
+        for (thread, codes), count in self.stacks.items():
+            stack = []
+            for code in codes:
+                if code not in index:
+                    function, file, line = frame_label(code)
+                    index[code] = len(frames)
+                    frames.append({"name": function, "file": file, "line": line})
+                stack.append(index[code])
+            profile = profiles.setdefault(thread, {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": 0,
+                "samples": [],
+                "weights": [],
+            })
+            profile["samples"].append(stack)
+            # Each sample stands for one interval
+            profile["weights"].append(count * self.interval)
+            profile["endValue"] += count * self.interval
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "magazine-subscription",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+    def render(self, fmt: str, name: str = "profile") -> tuple[bytes, str]:
+        if fmt == "speedscope":
+            return json.dumps(self.speedscope(name)).encode(), "application/json"
+        return self.collapsed().encode(), "text/plain; charset=utf-8"
+
+
+class StackSampler:
+    """Samples every other thread's stack until stop() is called.
+
+    Idle threads (see IDLE_FRAMES) are skipped unless ``include_idle``.
+    Raises RuntimeError from start() if another profile is running.
+    """
+
+    def __init__(self, interval: float, include_idle: bool = False):
+        self.profile = Profile(interval)
+        self.include_idle = include_idle
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        if not _running.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        self._thread.join()
+        self.profile.elapsed = time.perf_counter() - self._started
+        _running.release()
+        return self.profile
+
+    async def stop_async(self) -> Profile:
+        """stop() for async code, joining the sampler thread in the threadpool.
+
+        Shielded from cancellation, so the profile lock is always released.
+        """
+        with anyio.CancelScope(shield=True):
+            return await run_in_threadpool(self.stop)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        stacks = self.profile.stacks
+        while not self._stop.wait(self.profile.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                name = names.get(ident)
+                if name is None:
+                    name = names[ident] = next(
+                        (t.name for t in threading.enumerate() if t.ident == ident), str(ident)
+                    )
+                stacks[name, tuple(codes)] += 1
+            self.profile.samples += 1
+
+
+async def is_admin(scope: Scope) -> bool:
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        principal = await auth.get_current_user(token)
+    except HTTPException:
+        return False
+    return principal["username"] in settings.ADMIN_USERNAMES
+
+
+class ProfilerMiddleware:
+    """Profiles one request end to end when it carries ``X-Profile``.
+
+    The header names the format (collapsed or speedscope); it only takes
+    effect with PROFILER_ENABLED and an admin bearer token, and is ignored
+    otherwise. The route runs as usual but its response is replaced by the
+    profile, with the route's status in X-Profiled-Status.
+
+    Every thread is sampled while the request runs, so profile on a worker
+    that isn't serving other traffic.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not settings.PROFILER_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        fmt = Headers(scope=scope).get("x-profile")
+        if fmt not in FORMATS or not await is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def discard(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        try:
+            sampler = StackSampler(settings.PROFILER_INTERVAL_MS / 1000).start()
+        except RuntimeError as error:
+            await self._send(send, 409, str(error).encode(), "text/plain; charset=utf-8", [])
+            return
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profile = await sampler.stop_async()
+        body, content_type = profile.render(fmt, f"{scope['method']} {scope['path']}")
+        headers = [
+            (b"x-profiled-status", str(status).encode()),
+            (b"x-profile-samples", str(profile.samples).encode()),
+        ]
+        await self._send(send, 200, body, content_type, headers)
+
+    @staticmethod
+    async def _send(send: Send, status: int, body: bytes, content_type: str, headers: list):
+        headers = [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,106 @@
+from datetime import date
+from typing import Annotated
+from fastapi import Depends, Query
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+import models as models
+
+# Statements shared by the sync routes in main.py and async_routes.py
+
+# Columns of the Subscription response schema
+SUBSCRIPTION_COLUMNS = (
+    models.Subscription.id,
+    models.Subscription.user_id,
+    models.Subscription.magazine_id,
+    models.Subscription.plan_id,
+    models.Subscription.renewal_date,
+    models.Subscription.price,
+    models.Subscription.is_active,
+    models.Subscription.version,
+)
+
+
+# INSERT ... RETURNING, so the response needs no follow-up SELECT
+def insert_subscription(**values):
+    return (
+        insert(models.Subscription)
+        .values(**values)
+        .returning(*SUBSCRIPTION_COLUMNS)
+    )
+
+
+# Multi-row INSERT ... RETURNING for executemany; rows come back in
+# parameter order
+def insert_subscriptions():
+    return insert(models.Subscription).returning(
+        *SUBSCRIPTION_COLUMNS, sort_by_parameter_order=True
+    )
+
+
+# First half of a modification: deactivate the user's current row, guarded on
+# it still being active (and on the client's version, when given), so of two
+# concurrent modifies only one matches. Returns the owner for the new row.
+def retire_subscription(subscription_id: int, user_id: int, version: int | None = None):
+    conditions = [
+        models.Subscription.id == subscription_id,
+        models.Subscription.user_id == user_id,
+        models.Subscription.is_active == True,
+    ]
+    if version is not None:
+        conditions.append(models.Subscription.version == version)
+    return (
+        update(models.Subscription)
+        .where(*conditions)
+        .values(is_active=False, version=models.Subscription.version + 1)
+        .returning(models.Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# (magazine_id, plan_id) of a user's active subscriptions to the given
+# magazines; an index range scan on the partial unique index
+def active_subscription_pairs(user_id: int, magazine_ids):
+    return select(models.Subscription.magazine_id, models.Subscription.plan_id).where(
+        models.Subscription.user_id == user_id,
+        models.Subscription.is_active == True,
+        models.Subscription.magazine_id.in_(magazine_ids),
+    )
+
+
+def is_active_subscription_conflict(error: IntegrityError) -> bool:
+    message = str(error.orig)
+    # PostgreSQL names the index, SQLite lists its columns
+    return models.ACTIVE_SUBSCRIPTION_INDEX in message or (
+        "UNIQUE constraint failed: subscriptions.user_id, subscriptions.magazine_id, "
+        "subscriptions.plan_id" in message
+    )
+
+
+def is_foreign_key_violation(error: IntegrityError) -> bool:
+    message = str(error.orig)
+    return "FOREIGN KEY constraint failed" in message or "violates foreign key constraint" in message
+
+
+# Optional server-side filters for the subscription list
+def subscription_filters(
+    is_active: bool | None = Query(None),
+    magazine_id: int | None = Query(None),
+    plan_id: int | None = Query(None),
+    renewal_from: date | None = Query(None, description="Renewal date on or after"),
+    renewal_to: date | None = Query(None, description="Renewal date on or before"),
+) -> list:
+    conditions = []
+    if is_active is not None:
+        conditions.append(models.Subscription.is_active == is_active)
+    if magazine_id is not None:
+        conditions.append(models.Subscription.magazine_id == magazine_id)
+    if plan_id is not None:
+        conditions.append(models.Subscription.plan_id == plan_id)
+    if renewal_from is not None:
+        conditions.append(models.Subscription.renewal_date >= renewal_from)
+    if renewal_to is not None:
+        conditions.append(models.Subscription.renewal_date <= renewal_to)
+    return conditions
+
+
+subscription_filters_dependency = Annotated[list, Depends(subscription_filters)]
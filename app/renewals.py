@@ -0,0 +1,157 @@
+import calendar
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from sqlalchemy import and_, bindparam, or_, select, update
+import models as models
+from catalog import catalog_cache
+from pricing import calculate_price
+from subscription_cache import subscription_cache
+
+# Batch renewal engine: every active subscription due on or before ``as_of``
+# gets its renewal_date advanced by its plan's renewal_period (in months) and
+# its price recalculated from the current catalog, a chunk per transaction.
+#
+# Several workers can run at once. On PostgreSQL each chunk is claimed with
+# FOR UPDATE SKIP LOCKED, so workers split the due rows between them. SQLite
+# has no row locks; there the UPDATE only applies while renewal_date still
+# holds the value that was read, so a row renewed by another worker in the
+# meantime is counted as contended instead of renewed twice.
+
+
+@dataclass
+class RenewalReport:
+    as_of: date
+    renewed: int = 0
+    skipped: int = 0
+    contended: int = 0
+    chunks: int = 0
+    oldest_due: date | None = None
+    started: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.renewed / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "as_of": self.as_of.isoformat(),
+            "renewed": self.renewed,
+            "skipped": self.skipped,
+            "contended": self.contended,
+            "chunks": self.chunks,
+            # How far behind the oldest due subscription was
+            "lag_days": (self.as_of - self.oldest_due).days if self.oldest_due else 0,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def next_renewal(renewal_date: date, period: int, as_of: date) -> date:
+    """First renewal date after ``as_of``.
+
+    Subscriptions that missed several periods catch up in one step rather
+    than being renewed once per missed period.
+    """
+    months_behind = (as_of.year - renewal_date.year) * 12 + as_of.month - renewal_date.month
+    periods = max(1, months_behind // period)
+    while add_months(renewal_date, periods * period) <= as_of:
+        periods += 1
+    return add_months(renewal_date, periods * period)
+
+
+def due_subscriptions(as_of: date, limit: int, after: tuple | None = None, skip_locked: bool = False):
+    subscription = models.Subscription
+    statement = select(
+        subscription.id,
+        subscription.user_id,
+        subscription.magazine_id,
+        subscription.plan_id,
+        subscription.renewal_date,
+    ).where(subscription.is_active == True, subscription.renewal_date <= as_of)
+    if after is not None:
+        # Keyset past rows this run already looked at but left due (skipped)
+        after_date, after_id = after
+        statement = statement.where(
+            or_(
+                subscription.renewal_date > after_date,
+                and_(subscription.renewal_date == after_date, subscription.id > after_id),
+            )
+        )
+    statement = statement.order_by(subscription.renewal_date, subscription.id).limit(limit)
+    if skip_locked:
+        statement = statement.with_for_update(skip_locked=True)
+    return statement
+
+
+_table = models.Subscription.__table__
+RENEW = (
+    update(_table)
+    .where(
+        _table.c.id == bindparam("b_id"),
+        _table.c.renewal_date == bindparam("b_due"),
+        _table.c.is_active == True,
+    )
+    .values(
+        renewal_date=bindparam("b_next"),
+        price=bindparam("b_price"),
+        version=_table.c.version + 1,
+    )
+)
+
+
+def run_renewals(session_factory, as_of: date, chunk_size: int = 1000, on_progress=None) -> RenewalReport:
+    report = RenewalReport(as_of)
+    after = None
+    with session_factory() as db:
+        dialect = db.get_bind().dialect
+        skip_locked = dialect.name == "postgresql"
+        while True:
+            rows = db.execute(due_subscriptions(as_of, chunk_size, after, skip_locked)).all()
+            if not rows:
+                db.rollback()
+                break
+            after = (rows[-1].renewal_date, rows[-1].id)
+            if report.oldest_due is None:
+                report.oldest_due = rows[0].renewal_date
+
+            magazines = catalog_cache.lookup_many("magazines", db, {row.magazine_id for row in rows})
+            plans = catalog_cache.lookup_many("plans", db, {row.plan_id for row in rows})
+            params = []
+            for row in rows:
+                magazine, plan = magazines.get(row.magazine_id), plans.get(row.plan_id)
+                if magazine is None or plan is None or plan["renewal_period"] <= 0:
+                    report.skipped += 1
+                    continue
+                price = calculate_price(magazine["base_price"], plan["discount"])
+                if price <= 0:
+                    report.skipped += 1
+                    continue
+                params.append({
+                    "b_id": row.id,
+                    "b_due": row.renewal_date,
+                    "b_next": next_renewal(row.renewal_date, plan["renewal_period"], as_of),
+                    "b_price": price,
+                })
+            if params:
+                result = db.execute(RENEW, params)
+                renewed = result.rowcount if dialect.supports_sane_multi_rowcount else len(params)
+                report.renewed += renewed
+                report.contended += len(params) - renewed
+            db.commit()
+            if params:
+                subscription_cache.invalidate_users(row.user_id for row in rows)
+
+            report.chunks += 1
+            report.elapsed = time.perf_counter() - report.started
+            if on_progress is not None:
+                on_progress(report)
+    report.elapsed = time.perf_counter() - report.started
+    return report
@@ -0,0 +1,253 @@
+import hashlib
+import math
+import threading
+import time
+from typing import TYPE_CHECKING
+from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import RevokedToken, RevokedUser
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over byte keys (double hashing on blake2b)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self._bits
+        for pos in self._positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+def _user_key(user_id: int) -> bytes:
+    return b"u" + str(user_id).encode()
+
+
+def _token_key(digest: bytes) -> bytes:
+    return b"t" + digest
+
+
+class RevocationList:
+    """In-process view of the revoked_tokens / revoked_users tables.
+
+    ``is_revoked`` is on every authenticated request, so the common "not
+    revoked" answer comes from a Bloom filter without touching the database;
+    only Bloom positives are confirmed against the exact sets. ``refresh``
+    pulls rows added by other workers since the last seen ids and drops
+    revoked tokens that have since expired, ``rebuild`` reloads everything.
+
+    Nothing is loaded lazily: ``rebuild`` must have run (the app's lifespan
+    does it) before ``is_revoked`` is asked.
+    """
+
+    def __init__(self, session_factory, capacity: int = 100000, error_rate: float = 0.001):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._tokens: dict[bytes, float] = {}
+        self._users: set[int] = set()
+        self._last_token_id = 0
+        self._last_user_id = 0
+        self.checks = 0
+        self.bloom_positives = 0
+        self.revoked_hits = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def is_revoked(self, digest: bytes, user_id: int) -> bool:
+        self.checks += 1
+        user_key, token_key = _user_key(user_id), _token_key(digest)
+        bloom = self._bloom
+        if user_key not in bloom and token_key not in bloom:
+            return False
+        self.bloom_positives += 1
+        if user_id in self._users:
+            self.revoked_hits += 1
+            return True
+        expires_at = self._tokens.get(digest)
+        if expires_at is not None and expires_at > time.time():
+            self.revoked_hits += 1
+            return True
+        return False
+
+    def revoke_token(self, db: Session, digest: bytes, user_id: int, expires_at: float):
+        db.add(_revoked_token_row(digest, user_id, expires_at))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Already revoked, possibly by another worker
+            db.rollback()
+        with self._lock:
+            self._add_token(digest, expires_at)
+
+    def revoke_user(self, db: Session, user_id: int):
+        if user_id not in self._users:
+            db.add(RevokedUser(user_id=user_id, revoked_at=datetime.now(timezone.utc)))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+        with self._lock:
+            self._add_user(user_id)
+
+    async def revoke_token_async(self, db: "AsyncSession", digest: bytes, user_id: int, expires_at: float):
+        db.add(_revoked_token_row(digest, user_id, expires_at))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+        with self._lock:
+            self._add_token(digest, expires_at)
+
+    async def revoke_user_async(self, db: "AsyncSession", user_id: int):
+        if user_id not in self._users:
+            db.add(RevokedUser(user_id=user_id, revoked_at=datetime.now(timezone.utc)))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+        with self._lock:
+            self._add_user(user_id)
+
+    def refresh(self):
+        """Load rows added since the last refresh, and forget expired tokens."""
+        if not self._loaded:
+            self.rebuild()
+            return
+        with self.session_factory() as db:
+            tokens = (
+                db.query(RevokedToken.id, RevokedToken.token_digest, RevokedToken.expires_at)
+                .filter(RevokedToken.id > self._last_token_id)
+                .order_by(RevokedToken.id)
+                .all()
+            )
+            users = (
+                db.query(RevokedUser.id, RevokedUser.user_id)
+                .filter(RevokedUser.id > self._last_user_id)
+                .order_by(RevokedUser.id)
+                .all()
+            )
+        with self._lock:
+            for row_id, digest, expires_at in tokens:
+                self._add_token(bytes.fromhex(digest), _timestamp(expires_at))
+                self._last_token_id = max(self._last_token_id, row_id)
+            for row_id, user_id in users:
+                self._add_user(user_id)
+                self._last_user_id = max(self._last_user_id, row_id)
+            self._prune(time.time())
+
+    def rebuild(self):
+        """Reload both tables from scratch into a freshly sized filter."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        with self.session_factory() as db:
+            tokens = (
+                db.query(RevokedToken.id, RevokedToken.token_digest, RevokedToken.expires_at)
+                .filter(RevokedToken.expires_at > now)
+                .all()
+            )
+            last_token_id = db.query(RevokedToken.id).order_by(RevokedToken.id.desc()).limit(1).scalar()
+            users = db.query(RevokedUser.id, RevokedUser.user_id).all()
+        bloom = BloomFilter(max(self.capacity, 2 * (len(tokens) + len(users))), self.error_rate)
+        token_map = {}
+        for _, digest, expires_at in tokens:
+            raw = bytes.fromhex(digest)
+            token_map[raw] = _timestamp(expires_at)
+            bloom.add(_token_key(raw))
+        user_set = set()
+        for _, user_id in users:
+            user_set.add(user_id)
+            bloom.add(_user_key(user_id))
+        with self._lock:
+            self._bloom, self._tokens, self._users = bloom, token_map, user_set
+            self._last_token_id = last_token_id or 0
+            self._last_user_id = max((row_id for row_id, _ in users), default=0)
+            self._loaded = True
+
+    def _add_token(self, digest: bytes, expires_at: float):
+        if digest not in self._tokens:
+            self._tokens[digest] = expires_at
+            self._add_key(_token_key(digest))
+
+    def _add_user(self, user_id: int):
+        if user_id not in self._users:
+            self._users.add(user_id)
+            self._add_key(_user_key(user_id))
+
+    def _add_key(self, key: bytes):
+        if self._bloom.count >= self._bloom.capacity:
+            # Past capacity the false-positive rate climbs, so grow the filter
+            self._refill(2 * self._bloom.capacity)
+        else:
+            self._bloom.add(key)
+
+    def _prune(self, now: float):
+        expired = [digest for digest, expires_at in self._tokens.items() if expires_at <= now]
+        if expired:
+            for digest in expired:
+                del self._tokens[digest]
+            # Keys can't be taken out of a Bloom filter, so start a new one
+            self._refill(self._bloom.capacity)
+
+    def _refill(self, capacity: int):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for digest in self._tokens:
+            bloom.add(_token_key(digest))
+        for user_id in self._users:
+            bloom.add(_user_key(user_id))
+        self._bloom = bloom
+
+    def stats(self) -> dict:
+        return {
+            "revoked_tokens": len(self._tokens),
+            "revoked_users": len(self._users),
+            "bloom_bits": self._bloom.num_bits,
+            "bloom_hashes": self._bloom.num_hashes,
+            "checks": self.checks,
+            "bloom_positives": self.bloom_positives,
+            "revoked_hits": self.revoked_hits,
+        }
+
+
+def _revoked_token_row(digest: bytes, user_id: int, expires_at: float) -> RevokedToken:
+    return RevokedToken(
+        token_digest=digest.hex(),
+        user_id=user_id,
+        expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+        revoked_at=datetime.now(timezone.utc),
+    )
+
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
@@ -17,6 +17,8 @@ class SubscriptionUpdate(BaseModel):
     magazine_id: int
     plan_id: int
     renewal_date: date
+    # The version the client last saw; a mismatch is rejected with 409
+    version: int | None = None
 
 
 class Subscription(BaseModel):
@@ -27,6 +29,7 @@ class Subscription(BaseModel):
     renewal_date: date
     price: float = Field(..., gt=0)
     is_active: bool
+    version: int
 
     class Config:
         from_attributes = True
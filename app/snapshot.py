@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, select
+import models as models
+from catalog import CATALOG_COLUMNS
+from queries import SUBSCRIPTION_COLUMNS
+
+# Columnar (Parquet / Arrow IPC) snapshots for analysis, written a cursor
+# batch at a time. Needs the optional pyarrow package.
+#
+# Each table gets a directory of numbered parts plus a manifest.json. A full
+# snapshot replaces the parts; an incremental one appends a part holding the
+# rows with id above the manifest's max_id. Incremental parts only pick up
+# new rows, so take a full snapshot now and then to capture updates.
+
+SNAPSHOT_TABLES = {
+    "subscriptions": SUBSCRIPTION_COLUMNS,
+    "magazines": CATALOG_COLUMNS["magazines"],
+    "plans": CATALOG_COLUMNS["plans"],
+    # No hashed_password
+    "users": (models.User.id, models.User.username, models.User.email, models.User.is_active),
+}
+
+FORMATS = ("parquet", "arrow")
+SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Snapshots need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def arrow_schema(table: str):
+    pa = _pyarrow()
+    types = (
+        (Boolean, pa.bool_()),
+        (Integer, pa.int64()),
+        (Float, pa.float64()),
+        (Date, pa.date32()),
+        (DateTime, pa.timestamp("us")),
+        (String, pa.string()),
+    )
+    fields = []
+    for column in SNAPSHOT_TABLES[table]:
+        arrow_type = next(t for sql_type, t in types if isinstance(column.type, sql_type))
+        fields.append(pa.field(column.key, arrow_type, nullable=column.key != "id"))
+    return pa.schema(fields)
+
+
+@dataclass
+class SnapshotPart:
+    file: str
+    rows: int
+    min_id: int | None
+    max_id: int | None
+    created_at: float
+
+
+def read_manifest(directory: str, table: str) -> dict:
+    path = os.path.join(directory, table, "manifest.json")
+    if not os.path.exists(path):
+        return {"table": table, "format": None, "max_id": 0, "parts": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(directory: str, table: str, manifest: dict):
+    path = os.path.join(directory, table, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def write_snapshot(session_factory, table: str, directory: str, fmt: str = "parquet", incremental: bool = False, batch_size: int = 10000) -> SnapshotPart:
+    pa = _pyarrow()
+    manifest = read_manifest(directory, table)
+    if incremental and manifest["parts"] and manifest["format"] != fmt:
+        raise ValueError(f"{table} snapshot is {manifest['format']}, not {fmt}")
+    since_id = manifest["max_id"] if incremental else 0
+    number = len(manifest["parts"]) if incremental else 0
+
+    table_dir = os.path.join(directory, table)
+    os.makedirs(table_dir, exist_ok=True)
+    file = f"part-{number:05d}{SUFFIXES[fmt]}"
+    path = os.path.join(table_dir, file)
+    schema = arrow_schema(table)
+    columns = SNAPSHOT_TABLES[table]
+    statement = (
+        select(*columns)
+        .where(columns[0] > since_id)
+        .order_by(columns[0])
+        .execution_options(yield_per=batch_size)
+    )
+
+    rows, min_id, max_id = 0, None, None
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(path + ".tmp", schema)
+    else:
+        writer = pa.ipc.new_file(path + ".tmp", schema)
+    try:
+        with session_factory() as db:
+            for partition in db.execute(statement).partitions():
+                arrays = [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*partition), schema)
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows += len(partition)
+                min_id = partition[0][0] if min_id is None else min_id
+                max_id = partition[-1][0]
+    finally:
+        writer.close()
+    part = SnapshotPart(file, rows, min_id, max_id, time.time())
+    if incremental and not rows:
+        # Nothing new since the last part
+        os.remove(path + ".tmp")
+        return part
+    os.replace(path + ".tmp", path)
+
+    if not incremental:
+        for old in manifest["parts"]:
+            if old["file"] != file:
+                os.remove(os.path.join(table_dir, old["file"]))
+        manifest["parts"] = []
+    manifest["format"] = fmt
+    manifest["parts"].append(asdict(part))
+    manifest["max_id"] = max(manifest["max_id"] if incremental else 0, max_id or 0)
+    _write_manifest(directory, table, manifest)
+    return part
+
+
+def read_snapshot(directory: str, table: str):
+    """Load every part of a snapshot as one pyarrow Table.
+
+    Files are memory-mapped: Arrow IPC parts are used in place without
+    copying, Parquet parts are decoded from the mapped pages.
+    """
+    pa = _pyarrow()
+    manifest = read_manifest(directory, table)
+    tables = []
+    for part in manifest["parts"]:
+        path = os.path.join(directory, table, part["file"])
+        if manifest["format"] == "arrow":
+            tables.append(pa.ipc.open_file(pa.memory_map(path)).read_all())
+        else:
+            tables.append(pa.parquet.read_table(path, memory_map=True))
+    if not tables:
+        return arrow_schema(table).empty_table()
+    return pa.concat_tables(tables)
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import Request, Response
+from config import settings
+import fastjson
+import tracing
+
+
+@dataclass(frozen=True)
+class CachedList:
+    body: bytes
+    headers: dict
+    stored_at: float
+
+    def response(self) -> Response:
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+PAGE_HEADERS = ("X-Next-Cursor", "Link")
+
+
+def encode_list(rows) -> bytes:
+    return fastjson.dumps([dict(row) for row in rows])
+
+
+def render(rows, response: Response) -> CachedList:
+    """Serialize a page of subscription rows along with its pagination headers."""
+    headers = {name: response.headers[name] for name in PAGE_HEADERS if name in response.headers}
+    with tracing.span("serialize.subscriptions"):
+        return CachedList(encode_list(rows), headers, time.time())
+
+
+def list_key(request: Request) -> str:
+    """The query string with its parameters in a canonical order."""
+    return "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+
+class SubscriptionListCache:
+    """Serialized GET /subscriptions/ responses, per user and query string.
+
+    Users are evicted least recently used first once the cached bodies pass
+    ``max_bytes``. Every write to a user's subscriptions calls
+    ``invalidate_user``; ``ttl`` bounds how long writes made by other worker
+    processes (or by cli.py jobs) can go unseen.
+
+    A response computed while an invalidation for its user landed is not
+    stored: callers take a ``ticket`` before querying and hand it to ``put``.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 30.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users: OrderedDict[int, dict[str, CachedList]] = OrderedDict()
+        self._bytes = 0
+        # Invalidation counter, and the counter value at each user's latest
+        # invalidation (bounded; tickets older than _floor are refused)
+        self._clock = 0
+        self._invalidated: OrderedDict[int, int] = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_fills = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl > 0
+
+    def ticket(self) -> int:
+        return self._clock
+
+    def get(self, user_id: int, key: str) -> CachedList | None:
+        with self._lock:
+            entries = self._users.get(user_id)
+            entry = entries.get(key) if entries is not None else None
+            if entry is None or time.time() - entry.stored_at >= self.ttl:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+    def put(self, user_id: int, key: str, entry: CachedList, ticket: int):
+        if not self.enabled or len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            if ticket < self._floor or self._invalidated.get(user_id, -1) >= ticket:
+                self.stale_fills += 1
+                return
+            entries = self._users.setdefault(user_id, {})
+            previous = entries.get(key)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            entries[key] = entry
+            self._bytes += len(entry.body)
+            self._users.move_to_end(user_id)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._users.popitem(last=False)
+                self._bytes -= sum(len(cached.body) for cached in evicted.values())
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        self.invalidate_users((user_id,))
+
+    def invalidate_users(self, user_ids):
+        with self._lock:
+            for user_id in set(user_ids):
+                entries = self._users.pop(user_id, None)
+                if entries is not None:
+                    self._bytes -= sum(len(entry.body) for entry in entries.values())
+                self._invalidated[user_id] = self._clock
+                self._invalidated.move_to_end(user_id)
+                self.invalidations += 1
+            self._clock += 1
+            # Forget the oldest invalidations, refusing any ticket they could
+            # still have to veto
+            while len(self._invalidated) > 100000:
+                _, at = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, at + 1)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._bytes = 0
+            self._clock += 1
+            self._floor = self._clock
+            self._invalidated.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "entries": sum(len(entries) for entries in self._users.values()),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_fills": self.stale_fills,
+            }
+
+
+subscription_cache = SubscriptionListCache(
+    settings.SUBSCRIPTION_CACHE_MAX_BYTES, settings.SUBSCRIPTION_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,90 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """Bounded LRU of bearer tokens that already passed ``jwt.decode``.
+
+    Entries are keyed by ``token_digest(token)`` (so raw tokens are never kept
+    in memory) and expire at the token's own ``exp`` claim, capped by
+    ``ttl`` seconds. A per-user index lets ``invalidate_user`` drop every token
+    of a user in one call.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[bytes, tuple[str, int, float]] = OrderedDict()
+        self._by_user: dict[int, set[bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            username, user_id, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key, user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {"username": username, "user_id": user_id}
+
+    def put(self, key: bytes, principal: dict, exp: float):
+        expires_at = min(float(exp), time.time() + self.ttl)
+        if self.maxsize <= 0 or expires_at <= time.time():
+            return
+        user_id = principal["user_id"]
+        with self._lock:
+            self._entries[key] = (principal["username"], user_id, expires_at)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (_, old_user_id, _) = self._entries.popitem(last=False)
+                self._unindex(old_key, old_user_id)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> int:
+        with self._lock:
+            keys = self._by_user.pop(user_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, key: bytes, user_id: int):
+        self._entries.pop(key, None)
+        self._unindex(key, user_id)
+
+    def _unindex(self, key: bytes, user_id: int):
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
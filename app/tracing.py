@@ -0,0 +1,91 @@
+from contextlib import nullcontext
+from opentelemetry import trace
+from config import settings
+
+# OpenTelemetry tracing. Off unless TRACING_ENABLED; the SDK and the OTLP
+# exporter are optional (pip install opentelemetry-sdk
+# opentelemetry-exporter-otlp-proto-http).
+#
+# configure() installs the global tracer provider, which also switches on
+# FastAPI's own spans: the server span per request, and fastapi.dependencies,
+# fastapi.endpoint and fastapi.serialization under it. On top of those the
+# app records auth.get_current_user, one span per SQL statement (see
+# db/session.py), db.commit / db.refresh and bcrypt work.
+#
+# Until then ``tracer`` is None and span() returns a shared no-op context
+# manager, so instrumented code pays one global lookup per span.
+
+provider = None
+tracer = None
+
+_NO_SPAN = nullcontext()
+
+
+def span(name: str, attributes: dict | None = None):
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def _sdk():
+    try:
+        import opentelemetry.sdk.trace
+        import opentelemetry.sdk.trace.export
+        import opentelemetry.sdk.trace.sampling
+        import opentelemetry.sdk.resources
+    except ImportError:
+        raise RuntimeError("Tracing needs opentelemetry-sdk: pip install opentelemetry-sdk") from None
+    return opentelemetry.sdk
+
+
+def exporter_from_settings():
+    export = _sdk().trace.export
+    if settings.TRACING_EXPORTER == "console":
+        return export.ConsoleSpanExporter()
+    if settings.TRACING_EXPORTER == "file":
+        # One JSON span per line
+        return export.ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE, "a"),
+            formatter=lambda finished: finished.to_json(indent=None) + "\n",
+        )
+    if settings.TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            raise RuntimeError(
+                "OTLP export needs pip install opentelemetry-exporter-otlp-proto-http"
+            ) from None
+        # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown tracing exporter: {settings.TRACING_EXPORTER}")
+
+
+def configure(exporter=None):
+    """Start recording spans and send them to ``exporter``.
+
+    Without one, TRACING_EXPORTER picks it. OTLP spans are exported in
+    batches off the request path; other exporters get each span as it ends.
+    The global provider can only be set once per process, so calling this
+    again adds another exporter to the same provider.
+    """
+    global provider, tracer
+    sdk = _sdk()
+    if provider is None:
+        sampler = sdk.trace.sampling.ParentBased(
+            sdk.trace.sampling.TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)
+        )
+        resource = sdk.resources.Resource.create({"service.name": settings.TRACING_SERVICE_NAME})
+        provider = sdk.trace.TracerProvider(sampler=sampler, resource=resource)
+        trace.set_tracer_provider(provider)
+        tracer = provider.get_tracer("magazine-subscription")
+    if exporter is None and settings.TRACING_EXPORTER == "otlp":
+        processor = sdk.trace.export.BatchSpanProcessor(exporter_from_settings())
+    else:
+        processor = sdk.trace.export.SimpleSpanProcessor(exporter or exporter_from_settings())
+    provider.add_span_processor(processor)
+
+
+def flush():
+    """Export spans still queued in batches."""
+    if provider is not None:
+        provider.force_flush()
@@ -0,0 +1,29 @@
+# gunicorn -c gunicorn.conf.py app.main:app
+#
+# Metrics from every worker are aggregated through PROMETHEUS_MULTIPROC_DIR
+# (see app/metrics.py); stale files in it are removed when gunicorn starts.
+import glob
+import os
+import tempfile
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to this one's
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (in-flight requests, pool, threadpool)
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,101 @@
+# get_subscriptions before and after archiving, on a dataset where 90% of the
+# subscriptions are old and inactive.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_archive --users 5000 --per-user 100
+
+import argparse
+import datetime
+import random
+import time
+
+
+def seed(users, per_user):
+    from app.main import SessionLocal, models
+
+    stamp = time.time_ns()
+    active_per_user = per_user // 10
+    with SessionLocal() as db:
+        db.execute(models.User.__table__.insert(), [
+            {"username": f"archive{stamp}_{i}", "email": f"archive{stamp}_{i}@example.com",
+             "hashed_password": "x", "is_active": True}
+            for i in range(users)
+        ])
+        db.execute(models.Magazine.__table__.insert(), [
+            {"name": f"Archive {i}", "description": "", "base_price": 10} for i in range(active_per_user)
+        ])
+        plan = models.Plan(title="Archive bench", description="", renewal_period=1, tier=1, discount=0.1)
+        db.add(plan)
+        db.flush()
+        user_rows = db.execute(
+            models.User.__table__.select().where(models.User.username.like(f"archive{stamp}_%"))
+        ).all()
+        magazine_ids = [id for (id,) in db.query(models.Magazine.id).order_by(models.Magazine.id.desc()).limit(active_per_user)]
+        batch, old, current = [], datetime.date(2020, 1, 1), datetime.date.today()
+        for user in user_rows:
+            for i in range(per_user):
+                active = i < active_per_user
+                batch.append({
+                    "user_id": user.id,
+                    "magazine_id": magazine_ids[i % active_per_user],
+                    "plan_id": plan.id,
+                    "renewal_date": current if active else old + datetime.timedelta(days=i),
+                    "price": 9.0,
+                    "is_active": active,
+                })
+            if len(batch) >= 20000:
+                db.execute(models.Subscription.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.execute(models.Subscription.__table__.insert(), batch)
+        db.commit()
+        return [(user.id, user.username) for user in user_rows]
+
+
+def measure(label, client, tokens, requests, path):
+    random.seed(0)
+    started = time.perf_counter()
+    rows = 0
+    for _ in range(requests):
+        response = client.get(path, headers=random.choice(tokens))
+        assert response.status_code == 200, response.text
+        rows += len(response.json())
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {requests / elapsed:8.0f} req/s  {rows / requests:6.1f} rows/response")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="get_subscriptions before/after archiving")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--per-user", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from app.main import SessionLocal, app, auth, models
+    from app.archive import archive_subscriptions
+
+    started = time.perf_counter()
+    users = seed(args.users, args.per_user)
+    print(f"seeded {args.users * args.per_user} subscriptions (90% inactive) in {time.perf_counter() - started:.1f}s")
+    tokens = [
+        {"Authorization": f"Bearer {auth.create_access_token(username, user_id, datetime.timedelta(hours=1))}"}
+        for user_id, username in random.sample(users, min(len(users), 500))
+    ]
+
+    def run(stage):
+        with SessionLocal() as db:
+            hot = db.query(models.Subscription).count()
+        print(f"{stage}: {hot} rows in subscriptions")
+        measure("  GET /subscriptions/", client, tokens, args.requests, "/subscriptions/")
+        measure("  GET /subscriptions/?is_active=true", client, tokens, args.requests, "/subscriptions/?is_active=true")
+
+    with TestClient(app) as client:
+        run("before")
+        report = archive_subscriptions(SessionLocal, datetime.date.today(), 365, 1000)
+        print(f"archived {report.archived} rows at {report.rows_per_second:.0f} rows/s")
+        run("after")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Sync vs async request path throughput.
+#
+# Runs the same workload twice, once per ASYNC_DB setting (each in its own
+# process, since the mode is picked when app.main is imported): a pool of
+# concurrent clients hammering catalog reads and an authenticated route.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_async_db --clients 500 --seconds 30
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+
+async def run_worker(clients, seconds):
+    import httpx
+    from app.main import app
+
+    # Count server errors (e.g. pool checkout timeouts) instead of raising
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        suffix = random.randint(100000, 999999)
+        username, password = f"bench{suffix}", "benchpassword"
+        response = await client.post(
+            "/users/register",
+            json={"username": username, "email": f"{username}@example.com", "password": password},
+        )
+        assert response.status_code == 200, response.text
+        response = await client.post("/users/login", json={"username": username, "password": password})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        magazine_ids = []
+        for i in range(20):
+            response = await client.post(
+                "/magazines/",
+                json={"name": f"Bench {i}", "description": "Benchmark magazine", "base_price": 10 + i},
+            )
+            magazine_ids.append(response.json()["id"])
+
+        completed = errors = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            nonlocal completed, errors
+            while time.perf_counter() < deadline:
+                if random.random() < 0.5:
+                    response = await client.get(f"/magazines/{random.choice(magazine_ids)}")
+                else:
+                    response = await client.get("/users/me", headers=headers)
+                if response.status_code == 200:
+                    completed += 1
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(worker()) for _ in range(clients)]
+        # Sync mode can wedge entirely (threads parked on pool checkout), so
+        # stop waiting shortly after the deadline
+        _, pending = await asyncio.wait(tasks, timeout=seconds + 5)
+        elapsed = time.perf_counter() - started
+
+    mode = "async" if os.environ.get("ASYNC_DB", "").lower() in ("1", "true") else "sync"
+    print(f"{mode:<6} {clients} clients, {elapsed:.1f}s: {completed} ok "
+          f"({completed / elapsed:.0f} req/s), {errors} errors, {len(pending)} stuck clients",
+          flush=True)
+    # Don't wait on stuck threadpool threads at interpreter exit
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async DB throughput")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(run_worker(args.clients, args.seconds))
+        return
+
+    for async_db in ("false", "true"):
+        env = dict(os.environ, ASYNC_DB=async_db)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_async_db", "--worker",
+             "--clients", str(args.clients), "--seconds", str(args.seconds)],
+            env=env,
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
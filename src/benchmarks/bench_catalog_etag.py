@@ -0,0 +1,66 @@
+# Conditional GET throughput on the catalog: a full 200 listing vs a warm
+# 304 Not Modified for the same URL.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_catalog_etag --magazines 1000 --seconds 10
+
+import argparse
+import asyncio
+import time
+
+
+async def measure(client, url, headers, clients, seconds, expected):
+    completed = errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal completed, errors
+        while time.perf_counter() < deadline:
+            response = await client.get(url, headers=headers)
+            if response.status_code == expected:
+                completed += 1
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return completed, errors, time.perf_counter() - started
+
+
+async def run(magazines, clients, seconds):
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for i in range(magazines):
+            response = await client.post(
+                "/magazines/",
+                json={"name": f"Bench {i}", "description": "Benchmark magazine " * 4, "base_price": 10 + i},
+            )
+            assert response.status_code == 200, response.text
+
+        url = f"/magazines/?limit={magazines}"
+        response = await client.get(url)
+        etag = response.headers["ETag"]
+        print(f"{len(response.json())} magazines, {len(response.content)} byte body, ETag {etag}")
+
+        for label, headers, expected in (
+            ("200 full body", {}, 200),
+            ("304 If-None-Match", {"If-None-Match": etag}, 304),
+        ):
+            completed, errors, elapsed = await measure(client, url, headers, clients, seconds, expected)
+            print(f"{label:<18} {completed / elapsed:8.0f} req/s ({completed} ok, {errors} errors)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog 200 vs 304 throughput")
+    parser.add_argument("--magazines", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.magazines, args.clients, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Subscription export throughput and memory: the streaming exporter (column
+# tuples in yield_per batches) per format, against loading every row as an
+# ORM object with .all().
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_export --rows 200000
+
+import argparse
+import datetime
+import time
+import tracemalloc
+
+
+def seed(rows):
+    from app.main import SessionLocal, models
+
+    with SessionLocal() as db:
+        user = models.User(username=f"export{time.time_ns()}", email=f"export{time.time_ns()}@example.com",
+                           hashed_password="x", is_active=True)
+        magazine = models.Magazine(name="Export bench", description="", base_price=10)
+        plan = models.Plan(title="Export bench", description="", renewal_period=1, tier=1, discount=0.1)
+        db.add_all([user, magazine, plan])
+        db.commit()
+        # One active row per (user, magazine, plan); the rest inactive
+        batch, renewal = [], datetime.date(2025, 1, 1)
+        for i in range(rows):
+            batch.append({"user_id": user.id, "magazine_id": magazine.id, "plan_id": plan.id,
+                          "renewal_date": renewal + datetime.timedelta(days=i % 365),
+                          "price": 9.0, "is_active": i == 0})
+            if len(batch) == 10000:
+                db.execute(models.Subscription.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.execute(models.Subscription.__table__.insert(), batch)
+        db.commit()
+
+
+def measure(label, fn, rows):
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    output = f"{size / 1e6:8.1f} MB out" if size is not None else " " * 15
+    print(f"{label:<22} {rows / elapsed:10.0f} rows/s  {output}  peak {peak / 1e6:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming export throughput")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    from app.main import SessionLocal, models
+    from app import exporter
+
+    with SessionLocal() as db:
+        total = db.query(models.Subscription).count()
+    print(f"{total} subscriptions")
+
+    for fmt, compress in (("ndjson", False), ("csv", False), ("ndjson", True)):
+        label = f"stream {fmt}" + (" gzip" if compress else "")
+        measure(label, lambda: sum(
+            len(chunk) for chunk in exporter.export_subscriptions(SessionLocal, fmt, [], compress, args.batch_size)
+        ), total)
+
+    def orm_all():
+        with SessionLocal() as db:
+            db.query(models.Subscription).all()
+
+    measure("ORM .all() (no encode)", orm_all, total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Per-row cost of the list routes' serialization paths, in µs/row:
+#   orm+pydantic  ORM objects validated through from_attributes (the old path)
+#   validated     the route with FAST_JSON_RESPONSES off (rows validated
+#                 against response_model)
+#   fast          the route with FAST_JSON_RESPONSES on (rows encoded as-is)
+# /subscriptions/ always encodes column rows (with its list cache disabled
+# here); its two route lines compare the stdlib and orjson encoders. Route
+# lines include the in-process HTTP round trip and the client parsing the
+# body, so they overstate the server's own per-row cost equally.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_list_serialization --rows 1000 --requests 200
+
+import argparse
+import datetime
+import time
+from typing import List
+
+
+def seed(rows):
+    from app.main import SessionLocal, models
+
+    stamp = time.time_ns()
+    with SessionLocal() as db:
+        db.execute(models.Magazine.__table__.insert(), [
+            {"name": f"Serialize {i}", "description": "Benchmark magazine", "base_price": 10 + i}
+            for i in range(rows)
+        ])
+        db.execute(models.Plan.__table__.insert(), [
+            {"title": f"Serialize {i}", "description": "Benchmark plan", "renewal_period": 1 + i % 12,
+             "tier": 1 + i % 3, "discount": i % 50 / 100}
+            for i in range(rows)
+        ])
+        user = models.User(username=f"serialize{stamp}", email=f"serialize{stamp}@example.com",
+                           hashed_password="x", is_active=True)
+        db.add(user)
+        db.flush()
+        magazine_id, plan_id = db.query(models.Magazine.id).first()[0], db.query(models.Plan.id).first()[0]
+        db.execute(models.Subscription.__table__.insert(), [
+            {"user_id": user.id, "magazine_id": magazine_id, "plan_id": plan_id, "price": 9.5,
+             "renewal_date": datetime.date(2025, 1, 1) + datetime.timedelta(days=i), "is_active": False}
+            for i in range(rows)
+        ])
+        db.commit()
+        return user.id, user.username
+
+
+def report(route, label, elapsed, calls, rows):
+    print(f"{route:<16} {label:<14} {elapsed / (calls * rows) * 1e6:8.2f} µs/row")
+
+
+def orm_pydantic(session_factory, model, schema, filters, rows, calls):
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(List[schema])
+    started = time.perf_counter()
+    for _ in range(calls):
+        with session_factory() as db:
+            objects = db.query(model).filter(*filters).order_by(model.id).limit(rows).all()
+            adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
+    return time.perf_counter() - started
+
+
+def route(client, path, headers, rows, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        response = client.get(path, params={"limit": rows}, headers=headers)
+        assert response.status_code == 200 and len(response.json()) == rows, response.text
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List route serialization cost per row")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from app.main import SessionLocal, app, auth, models, settings, subscription_cache
+    from app.schemas.magazine import Magazine
+    from app.schemas.plan import Plan
+    from app.schemas.subscription import Subscription
+    import fastjson
+
+    user_id, username = seed(args.rows)
+    token = auth.create_access_token(username, user_id, datetime.timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    subscription_cache.ttl = 0
+    rows, calls = args.rows, args.requests
+
+    with TestClient(app) as client:
+        for path, model, schema in (("/magazines/", models.Magazine, Magazine), ("/plans/", models.Plan, Plan)):
+            report(path, "orm+pydantic", orm_pydantic(SessionLocal, model, schema, [], rows, calls), calls, rows)
+            client.get(path, headers=headers)
+            settings.FAST_JSON_RESPONSES = False
+            report(path, "validated", route(client, path, headers, rows, calls), calls, rows)
+            settings.FAST_JSON_RESPONSES = True
+            report(path, "fast", route(client, path, headers, rows, calls), calls, rows)
+
+        path, filters = "/subscriptions/", [models.Subscription.user_id == user_id]
+        report(path, "orm+pydantic", orm_pydantic(SessionLocal, models.Subscription, Subscription, filters, rows, calls), calls, rows)
+        orjson, fastjson.orjson = fastjson.orjson, None
+        report(path, "rows+json", route(client, path, headers, rows, calls), calls, rows)
+        fastjson.orjson = orjson
+        if orjson is not None:
+            report(path, "rows+orjson", route(client, path, headers, rows, calls), calls, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Login storm benchmark.
+#
+# Fires a burst of concurrent logins while a second set of clients keeps
+# polling a non-auth endpoint, then reports login p99 and the latency the
+# non-auth clients saw while bcrypt work was in progress.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_login_storm --logins 200 --pollers 20
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from app.main import app, password_hasher
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, samples):
+    print(
+        f"{name:<12} n={len(samples):<6} "
+        f"p50={percentile(samples, 50) * 1000:8.1f}ms "
+        f"p99={percentile(samples, 99) * 1000:8.1f}ms "
+        f"max={max(samples, default=0) * 1000:8.1f}ms"
+    )
+
+
+async def login(client, username, password, samples):
+    start = time.perf_counter()
+    response = await client.post(
+        "/users/login", json={"username": username, "password": password}
+    )
+    samples.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.text
+
+
+async def poll(client, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/magazines/")
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+
+async def main(logins, pollers):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        suffix = random.randint(100000, 999999)
+        username, password = f"bench{suffix}", "benchpassword"
+        response = await client.post(
+            "/users/register",
+            json={"username": username, "email": f"{username}@example.com", "password": password},
+        )
+        assert response.status_code == 200, response.text
+
+        login_samples, poll_samples = [], []
+        stop = asyncio.Event()
+        poll_tasks = [asyncio.create_task(poll(client, stop, poll_samples)) for _ in range(pollers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(login(client, username, password, login_samples) for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*poll_tasks)
+
+    print(f"{logins} logins in {elapsed:.2f}s ({logins / elapsed:.1f} logins/s)")
+    report("login", login_samples)
+    report("non-auth", poll_samples)
+    print(f"hash pool: {password_hasher.stats()}")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login storm benchmark")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--pollers", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.pollers))
@@ -0,0 +1,93 @@
+# Price matrix: scalar calculate_price loop vs the NumPy broadcast behind
+# /pricing/matrix, plus the memoized endpoint itself.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_price_matrix --magazines 10000 --plans 20
+
+import argparse
+import asyncio
+import random
+import time
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def compute(magazine_count, plan_count, repeat):
+    from app.catalog import CatalogSnapshot
+    from app.pricing import PriceMatrix, calculate_price
+
+    magazines = CatalogSnapshot.from_rows(1, (
+        {"id": i, "name": f"M{i}", "description": "", "base_price": round(random.uniform(1, 200), 2)}
+        for i in range(1, magazine_count + 1)
+    ))
+    plans = CatalogSnapshot.from_rows(1, (
+        {"id": i, "title": f"P{i}", "description": "", "renewal_period": 1, "tier": i % 4 + 1,
+         "discount": round(random.uniform(0, 0.5), 2)}
+        for i in range(1, plan_count + 1)
+    ))
+
+    def scalar():
+        return [
+            [calculate_price(m["base_price"], p["discount"]) for p in plans.items]
+            for m in magazines.items
+        ]
+
+    scalar_time, expected = best_of(repeat, scalar)
+    vector_time, matrix = best_of(repeat, lambda: PriceMatrix.build(magazines, plans))
+    assert matrix.prices.tolist() == expected
+    print(f"{magazine_count} x {plan_count} prices")
+    print(f"scalar loop        {scalar_time * 1000:8.2f} ms")
+    print(f"numpy broadcast    {vector_time * 1000:8.2f} ms  ({scalar_time / vector_time:.0f}x)")
+
+
+async def endpoint(magazine_count, plan_count, repeat):
+    import httpx
+    from app.main import SessionLocal, models
+
+    with SessionLocal() as db:
+        db.add_all(
+            models.Magazine(name=f"Bench {i}", description="", base_price=10 + i % 90)
+            for i in range(magazine_count)
+        )
+        db.add_all(
+            models.Plan(title=f"Bench {i}", description="", renewal_period=1, tier=i % 4 + 1, discount=i / 100)
+            for i in range(plan_count)
+        )
+        db.commit()
+
+    from app.main import app, catalog_cache
+
+    catalog_cache.clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        response = await client.get("/pricing/matrix")
+        cold = time.perf_counter() - started
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await client.get("/pricing/matrix")
+            timings.append(time.perf_counter() - started)
+    print(f"/pricing/matrix    {cold * 1000:8.2f} ms cold (catalog load + build), "
+          f"{min(timings) * 1000:.2f} ms memoized, {len(response.content)} byte body")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scalar vs vectorized price matrix")
+    parser.add_argument("--magazines", type=int, default=10000)
+    parser.add_argument("--plans", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    compute(args.magazines, args.plans, args.repeat)
+    asyncio.run(endpoint(args.magazines, args.plans, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
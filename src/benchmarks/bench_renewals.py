@@ -0,0 +1,94 @@
+# Renewal engine throughput on a table of due subscriptions, with one or more
+# worker processes splitting the work (SKIP LOCKED on PostgreSQL, guarded
+# UPDATEs on SQLite).
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_renewals --rows 1000000 --workers 1 2
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import time
+
+AS_OF = datetime.date(2025, 1, 31)
+
+
+def seed(rows):
+    from app.main import SessionLocal, models
+
+    magazines, plans = 100, 10
+    users = -(-rows // (magazines * plans))
+    stamp = time.time_ns()
+    with SessionLocal() as db:
+        db.execute(models.User.__table__.insert(), [
+            {"username": f"renew{stamp}_{i}", "email": f"renew{stamp}_{i}@example.com",
+             "hashed_password": "x", "is_active": True}
+            for i in range(users)
+        ])
+        db.execute(models.Magazine.__table__.insert(), [
+            {"name": f"Renew {i}", "description": "", "base_price": 10 + i} for i in range(magazines)
+        ])
+        db.execute(models.Plan.__table__.insert(), [
+            {"title": f"Renew {i}", "description": "", "renewal_period": 1 + i % 12, "tier": 1, "discount": i / 100}
+            for i in range(plans)
+        ])
+        user_ids = [id for (id,) in db.query(models.User.id).order_by(models.User.id.desc()).limit(users)]
+        magazine_ids = [id for (id,) in db.query(models.Magazine.id).order_by(models.Magazine.id.desc()).limit(magazines)]
+        plan_ids = [id for (id,) in db.query(models.Plan.id).order_by(models.Plan.id.desc()).limit(plans)]
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "user_id": user_ids[i // (magazines * plans)],
+                "magazine_id": magazine_ids[i % magazines],
+                "plan_id": plan_ids[i // magazines % plans],
+                "renewal_date": AS_OF - datetime.timedelta(days=i % 400),
+                "price": 1.0,
+                "is_active": True,
+            })
+            if len(batch) == 20000:
+                db.execute(models.Subscription.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.execute(models.Subscription.__table__.insert(), batch)
+        db.commit()
+
+
+def worker(chunk_size, results):
+    from app.main import SessionLocal
+    from app.renewals import run_renewals
+
+    results.put(run_renewals(SessionLocal, AS_OF, chunk_size).as_dict())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renewal engine throughput")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    for workers in args.workers:
+        started = time.perf_counter()
+        seed(args.rows)
+        print(f"seeded {args.rows} due rows in {time.perf_counter() - started:.1f}s")
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(args.chunk_size, results)) for _ in range(workers)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        renewed = sum(report["renewed"] for report in reports)
+        contended = sum(report["contended"] for report in reports)
+        print(f"{workers} worker(s): {renewed} renewed, {contended} contended in {elapsed:.1f}s "
+              f"({renewed / elapsed:.0f} rows/s)")
+        for report in reports:
+            print("  " + json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# What tracing costs, in µs:
+#   span()        an instrumented block with tracing off, against a bare
+#                 nullcontext (paid per span: auth, commit, bcrypt, ...)
+#   off / on      GET /subscriptions/{id} round trips through TestClient with
+#                 tracing off, then on with --sample-ratio and an exporter
+#                 that drops the spans (so export cost isn't counted)
+# Tracing can't be switched off again once on, so "off" always runs first.
+#
+# Run from src/ with the same environment as the test suite:
+#   python -m benchmarks.bench_tracing --requests 2000 [--sample-ratio 1.0]
+
+import argparse
+import datetime
+import time
+import timeit
+from contextlib import nullcontext
+
+
+def seed():
+    from app.main import SessionLocal, models
+
+    stamp = time.time_ns()
+    with SessionLocal() as db:
+        user = models.User(username=f"tracing{stamp}", email=f"tracing{stamp}@example.com",
+                           hashed_password="x", is_active=True)
+        magazine = models.Magazine(name=f"Tracing {stamp}", description="Benchmark magazine", base_price=10)
+        plan = models.Plan(title=f"Tracing {stamp}", description="Benchmark plan", renewal_period=1, tier=1, discount=0)
+        db.add_all([user, magazine, plan])
+        db.flush()
+        subscription = models.Subscription(user_id=user.id, magazine_id=magazine.id, plan_id=plan.id,
+                                           price=10, renewal_date=datetime.date(2030, 1, 1), is_active=True)
+        db.add(subscription)
+        db.commit()
+        return user.id, user.username, subscription.id
+
+
+def per_request(client, path, headers, requests):
+    for _ in range(50):
+        client.get(path, headers=headers)
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing overhead")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sample-ratio", type=float, default=1.0)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+    from app.main import app, auth, settings, tracing
+
+    class DropSpans(SpanExporter):
+        def export(self, spans):
+            return SpanExportResult.SUCCESS
+
+    n = 1000000
+    bare = timeit.timeit("with block: pass", globals={"block": nullcontext()}, number=n) / n * 1e6
+    off = timeit.timeit("with span('x'): pass", globals={"span": tracing.span}, number=n) / n * 1e6
+    print(f"span() off  {off:8.3f} µs  (bare nullcontext {bare:.3f} µs)")
+
+    user_id, username, subscription_id = seed()
+    token = auth.create_access_token(username, user_id, datetime.timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    path = f"/subscriptions/{subscription_id}"
+    with TestClient(app) as client:
+        off = per_request(client, path, headers, args.requests)
+        print(f"request off {off:8.1f} µs")
+        settings.TRACING_SAMPLE_RATIO = args.sample_ratio
+        tracing.configure(DropSpans())
+        on = per_request(client, path, headers, args.requests)
+        print(f"request on  {on:8.1f} µs  (sample ratio {args.sample_ratio}, +{on - off:.1f} µs)")
+
+
+if __name__ == "__main__":
+    main()
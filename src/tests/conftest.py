@@ -4,7 +4,7 @@ import os
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.main import app
+from app.main import app, create_app
 from app.db.base import Base
 from app.db.session import get_db
 from .utils import create_user, login_user
@@ -30,12 +30,103 @@ app.dependency_overrides[get_db] = override_get_db
 # Create the database tables
 Base.metadata.create_all(bind=engine)
 
-# Fixture for the test client
-@pytest.fixture(scope="module")
-def client():
-    with TestClient(app) as c:
+# Apps serving the database routes through the sync session and through
+# async_routes (ASYNC_DB), so route tests cover both
+APPS = {}
+
+
+def get_app(mode: str):
+    if mode not in APPS:
+        APPS[mode] = create_app(async_db=mode == "async")
+        APPS[mode].dependency_overrides[get_db] = override_get_db
+    return APPS[mode]
+
+
+# Fixture for the test client, once per app
+@pytest.fixture(scope="module", params=["sync", "async"])
+def client(request):
+    with TestClient(get_app(request.param)) as c:
         yield c
 
+# Most SQL statements one request to each route may run, cold caches
+# included. Raise a budget only alongside the change that needs it.
+QUERY_BUDGETS = {
+    ("GET", "/magazines/"): 1,
+    ("GET", "/magazines/{magazine_id}"): 2,
+    ("GET", "/plans/"): 1,
+    ("GET", "/plans/{plan_id}"): 2,
+    ("GET", "/pricing/matrix"): 2,
+    ("GET", "/subscriptions/"): 1,
+    # Live table, then the archive
+    ("GET", "/subscriptions/{id}"): 2,
+    # Catalog snapshot loads when cold, then INSERT ... RETURNING
+    ("POST", "/subscriptions/"): 3,
+    # Catalog snapshot loads when cold, guarded UPDATE, INSERT ... RETURNING
+    ("PUT", "/subscriptions/{subscription_id}"): 4,
+    ("DELETE", "/subscriptions/{subscription_id}"): 3,
+    ("POST", "/users/login"): 1,
+    ("GET", "/users/me"): 1,
+}
+
+
+@pytest.fixture(autouse=True)
+def query_budget():
+    """Fail the test if a request ran more queries than its route's budget.
+
+    Yields the budgets; a test can tighten one for its own requests.
+    """
+    from app.main import SQLInstrumentationMiddleware
+
+    budgets, over = dict(QUERY_BUDGETS), []
+
+    def check(method, path, stats):
+        budget = budgets.get((method, path))
+        if budget is not None and stats.count > budget:
+            statements = "\n".join(f"  {statement}" for _, statement in stats.statements)
+            over.append(f"{method} {path} ran {stats.count} queries, budget {budget}:\n{statements}")
+
+    SQLInstrumentationMiddleware.observers.append(check)
+    yield budgets
+    SQLInstrumentationMiddleware.observers.remove(check)
+    assert not over, "\n".join(over)
+
+
+@pytest.fixture(scope="session")
+def tracing_exporter():
+    """Turns tracing on, recording spans in memory while ``collecting``.
+
+    The global tracer provider can only be installed once per process, so
+    this runs once and tracing stays on for the rest of the session; spans
+    of tests that aren't collecting them are dropped.
+    """
+    from opentelemetry.sdk.trace.export import SpanExportResult
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from app.main import tracing
+
+    class CollectingExporter(InMemorySpanExporter):
+        collecting = False
+
+        def export(self, spans):
+            if not self.collecting:
+                return SpanExportResult.SUCCESS
+            return super().export(spans)
+
+    exporter = CollectingExporter()
+    tracing.configure(exporter)
+    yield exporter
+    exporter.shutdown()
+
+
+@pytest.fixture(scope="function")
+def span_exporter(tracing_exporter):
+    """The in-memory exporter, holding only the spans of the current test."""
+    tracing_exporter.clear()
+    tracing_exporter.collecting = True
+    yield tracing_exporter
+    tracing_exporter.collecting = False
+    tracing_exporter.clear()
+
+
 @pytest.fixture(scope="function")
 def unique_email():
     return f"user{random.randint(1000, 9999)}@example.com"
@@ -83,7 +174,10 @@ def create_magazine(client, admin_user):
 @pytest.fixture(scope="session", autouse=True)
 def cleanup():
     yield
-    # Remove the test database file after the tests are completed
-    if os.path.exists("test.db"):
-        os.remove("test.db")
-        print("Test database file removed.")
+    # Remove the test database, and its WAL and shared-memory files, after
+    # the tests are completed
+    engine.dispose()
+    for path in ("test.db", "test.db-wal", "test.db-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    print("Test database files removed.")
@@ -1,5 +1,5 @@
 import pytest
-from .utils import create_user, login_user, create_plan, create_magazine
+from .utils import count_queries, create_user, login_user, create_plan, create_magazine
 
 def test_create_magazine(client, unique_username, unique_email):
     username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
@@ -57,3 +57,107 @@ def test_delete_magazine(client, unique_username, unique_email):
     # Verify magazine is deleted
     response = client.get(f"/magazines/{magazine['id']}", headers=headers)
     assert response.status_code == 404, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+def test_magazines_served_from_catalog_cache(client, unique_username, unique_email, monkeypatch):
+    from app.main import catalog_cache, settings
+
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    magazine = create_magazine(client, headers, "cached", base_price=10)
+    client.get("/magazines/", headers=headers)
+
+    with count_queries() as statements:
+        listing = client.get("/magazines/", params={"limit": 1000}, headers=headers)
+        item = client.get(f"/magazines/{magazine['id']}", headers=headers)
+    assert statements == []
+    assert magazine["id"] in [m["id"] for m in listing.json()]
+    assert item.json() == magazine
+
+    version = catalog_cache.version("magazines")
+    response = client.put(f"/magazines/{magazine['id']}", json={
+        "name": "Magazine recached",
+        "description": "Updated",
+        "base_price": 12.0,
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    assert catalog_cache.version("magazines") > version
+    # Invalidated synchronously by the write route
+    assert client.get(f"/magazines/{magazine['id']}", headers=headers).json()["base_price"] == 12.0
+
+    assert client.get("/internal/catalog-cache", headers=headers).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    stats = client.get("/internal/catalog-cache", headers=headers).json()
+    assert stats["hits"] > 0 and stats["rebuilds"] > 0 and stats["invalidations"] > 0
+
+def test_import_magazines_csv(client, unique_username, unique_email, monkeypatch):
+    from app.main import catalog_cache, settings
+
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "text/csv"}
+    suffix = username
+
+    body = (
+        "name,description,base_price\n"
+        f"Import A {suffix},First,10\n"
+        f"Import B {suffix},Second,20\n"
+        f"Import C {suffix},Bad price,-1\n"
+        f"Import A {suffix},First again,11\n"
+    )
+    response = client.post("/admin/import/magazines", content=body, headers=headers)
+    assert response.status_code == 403, response.text
+
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    version = catalog_cache.version("magazines")
+    response = client.post("/admin/import/magazines", content=body, headers=headers)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["rows"], report["inserted"], report["updated"], report["error_count"]) == (4, 2, 1, 1)
+    assert report["errors"][0]["line"] == 4
+    assert catalog_cache.version("magazines") == version + 1
+
+    # Re-importing updates in place rather than duplicating
+    response = client.post("/admin/import/magazines", content=body, headers=headers)
+    assert (response.json()["inserted"], response.json()["updated"]) == (0, 3)
+    magazines = client.get("/magazines/", params={"limit": 1000}, headers=headers).json()
+    imported = [m for m in magazines if m["name"] == f"Import A {suffix}"]
+    assert [m["base_price"] for m in imported] == [11]
+
+
+def test_import_catalog_cli(client, tmp_path, capsys):
+    from app.cli import main
+
+    path = tmp_path / "plans.ndjson"
+    path.write_text(
+        '{"title": "CLI Plan", "description": "Imported", "renewal_period": 1, "tier": 7, "discount": 0.1}\n'
+        "not json\n"
+    )
+    assert main(["import-catalog", "plans", str(path)]) == 1
+    assert main(["import-catalog", "plans", str(path)]) == 1
+    assert '"updated": 1' in capsys.readouterr().out
+
+@pytest.mark.parametrize("path", ["/magazines/", "/plans/"])
+def test_fast_json_list_matches_validated_list(client, unique_username, unique_email, monkeypatch, path):
+    from app.main import settings
+
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    create_magazine(client, headers, "fast_json", base_price=12.5)
+    create_plan(client, headers, title=f"Fast JSON {username}", discount=0.25)
+
+    params = {"limit": 2}
+    validated = client.get(path, params=params, headers=headers)
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = client.get(path, params=params, headers=headers)
+    assert fast.status_code == 200
+    assert fast.json() == validated.json()
+    for header in ("ETag", "Last-Modified", "X-Next-Cursor", "Link", "Content-Type"):
+        assert fast.headers.get(header) == validated.headers.get(header), header
+
+    # Conditional requests still short-circuit before encoding
+    response = client.get(path, params=params, headers={**headers, "If-None-Match": fast.headers["ETag"]})
+    assert response.status_code == 304
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+from prometheus_client import CollectorRegistry, multiprocess
+from prometheus_client.parser import text_string_to_metric_families
+from app.main import metrics
+from .utils import create_user, login_user
+
+
+def scrape(client) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return {family.name: family for family in text_string_to_metric_families(response.text)}
+
+
+def sample(families, name, suffix="", **labels):
+    family = families[name]
+    for s in family.samples:
+        if s.name == name + suffix and all(s.labels.get(k) == v for k, v in labels.items()):
+            return s.value
+    return None
+
+
+def test_metrics_scrape(client, unique_username, unique_email):
+    user = create_user(client, unique_username, unique_email, "password123")
+    token = login_user(client, user["username"], "password123")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    before = scrape(client)
+    for _ in range(3):
+        assert client.get("/magazines/", headers=headers).status_code == 200
+    assert client.get("/magazines/999999", headers=headers).status_code == 404
+    client.get("/no-such-route")
+    families = scrape(client)
+
+    latency = "http_request_duration_seconds"
+    route = {"method": "GET", "route": "/magazines/", "status": "200"}
+    served = sample(families, latency, "_count", **route)
+    assert served - (sample(before, latency, "_count", **route) or 0) == 3
+    assert sample(families, latency, "_bucket", le="+Inf", **route) == served
+    assert sample(families, latency, "_sum", **route) > 0
+    # Labelled by path template, never by the raw path
+    assert sample(families, latency, "_count", route="/magazines/{magazine_id}", status="404") >= 1
+    assert sample(families, latency, "_count", route="unmatched", status="404") >= 1
+    # The scrape itself is in flight
+    assert sample(families, "http_requests_in_flight") == 1
+
+    assert sample(families, "db_pool_checkouts", "_total") > 0
+    assert sample(families, "threadpool_max_threads") > 0
+    assert sample(families, "threadpool_busy_threads") >= 0
+    assert sample(families, "password_hash_in_flight") == 0
+    assert sample(families, "password_hash_queue_depth") == 0
+    assert sample(families, "cache_hits", "_total", cache="token") is not None
+    assert sample(families, "cache_misses", "_total", cache="catalog") is not None
+    assert sample(families, "cache_bytes", cache="subscription_list") is not None
+
+
+WORKER = """
+import asyncio
+import metrics
+
+class Route:
+    path = "/magazines/"
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def send(message):
+    pass
+
+async def serve():
+    app = metrics.MetricsMiddleware(endpoint)
+    for _ in range(5):
+        await app({"type": "http", "method": "GET"}, None, send)
+    metrics.refresh()
+
+asyncio.run(serve())
+"""
+
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    app_dir = os.path.dirname(metrics.__file__)
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", WORKER], cwd=app_dir, env=env, check=True)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    families = {family.name: family for family in registry.collect()}
+    route = {"method": "GET", "route": "/magazines/", "status": "200"}
+    assert sample(families, "http_request_duration_seconds", "_count", **route) == 10
+    assert sample(families, "http_request_duration_seconds", "_bucket", le="+Inf", **route) == 10
+    # livesum gauges only count processes that are still running
+    assert sample(families, "http_requests_in_flight") in (None, 0)
@@ -1,5 +1,5 @@
 import pytest
-from .utils import create_user, login_user
+from .utils import count_queries, create_plan, create_user, generate_random_plan_name, login_user
 
 def test_create_plan(client, unique_username, unique_email):
     username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
@@ -106,3 +106,33 @@ def test_create_plan_with_zero_renewal_period(client, unique_username, unique_em
         "discount": 0.1
     }, headers=headers)
     assert response.status_code == 422, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+
+def test_plans_conditional_get(client, unique_username, unique_email):
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    response = client.get("/plans/", headers=headers)
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+
+    with count_queries() as statements:
+        response = client.get("/plans/", headers={**headers, "If-None-Match": etag})
+        item = client.get(f"/plans/{plan['id']}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304 and item.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert statements == []
+
+    last_modified = client.get("/plans/", headers=headers).headers["Last-Modified"]
+    response = client.get("/plans/", headers={**headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # A write changes the representation, so the old ETag no longer matches
+    create_plan(client, headers, title=generate_random_plan_name())
+    response = client.get("/plans/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,45 @@
+from app.pricing import calculate_price
+from .utils import create_magazine, create_plan, create_user, generate_random_plan_name, login_user
+
+
+def test_price_matrix(client, unique_username, unique_email):
+    from app.main import price_matrix_cache
+
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    magazines = [create_magazine(client, headers, f"matrix_{i}", base_price=price) for i, price in enumerate((9.99, 25, 120.5))]
+    plans = [
+        create_plan(client, headers, title=generate_random_plan_name(), discount=discount, tier=tier)
+        for discount, tier in ((0.0, 1), (0.05, 2), (0.25, 4))
+    ]
+
+    response = client.get("/pricing/matrix", headers=headers)
+    assert response.status_code == 200, response.text
+    matrix = response.json()
+    for magazine in magazines:
+        row = matrix["prices"][matrix["magazine_ids"].index(magazine["id"])]
+        for plan in plans:
+            column = matrix["plan_ids"].index(plan["id"])
+            assert row[column] == calculate_price(magazine["base_price"], plan["discount"])
+
+    # Memoized until the catalog changes
+    builds = price_matrix_cache.builds
+    client.get("/pricing/matrix", headers=headers)
+    assert price_matrix_cache.builds == builds
+
+    response = client.get(
+        "/pricing/matrix",
+        params={"magazine_ids": [magazines[0]["id"], magazines[2]["id"]], "tiers": [4]},
+        headers=headers,
+    )
+    matrix = response.json()
+    assert matrix["magazine_ids"] == [magazines[0]["id"], magazines[2]["id"]]
+    assert plans[2]["id"] in matrix["plan_ids"]
+    assert plans[0]["id"] not in matrix["plan_ids"]
+    assert len(matrix["prices"]) == 2 and all(len(row) == len(matrix["plan_ids"]) for row in matrix["prices"])
+
+    create_magazine(client, headers, "matrix_new", base_price=5)
+    client.get("/pricing/matrix", headers=headers)
+    assert price_matrix_cache.builds == builds + 1
@@ -0,0 +1,83 @@
+import json
+import threading
+from app.main import profiler, settings
+from .utils import create_user, login_user
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        sampler = profiler.StackSampler(0.001).start()
+        stop.wait(0.2)
+        result = sampler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert result.samples > 0
+    lines = result.collapsed().splitlines()
+    spinning = [line for line in lines if line.startswith("spinner;")]
+    assert spinning and all("spin (tests/test_profiler.py:" in line for line in spinning)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in spinning) > 0
+
+    document = result.speedscope()
+    frames = document["shared"]["frames"]
+    (spinner,) = [p for p in document["profiles"] if p["name"] == "spinner"]
+    assert len(spinner["samples"]) == len(spinner["weights"])
+    assert any(frames[stack[-1]]["name"] == "spin" for stack in spinner["samples"])
+
+
+def test_profile_endpoint(client, unique_username, unique_email, monkeypatch):
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    assert client.get("/admin/profile", params={"seconds": 0.05}, headers=headers).status_code == 404
+
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    too_long = {"seconds": settings.PROFILER_MAX_SECONDS + 1}
+    assert client.get("/admin/profile", params=too_long, headers=headers).status_code == 422
+    response = client.get(
+        "/admin/profile",
+        params={"seconds": 0.1, "format": "speedscope", "include_idle": True},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    assert response.json()["profiles"]
+
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [])
+    assert client.get("/admin/profile", params={"seconds": 0.05}, headers=headers).status_code == 403
+
+
+def test_profile_single_request(client, unique_username, unique_email, monkeypatch):
+    username = create_user(client, unique_username, unique_email, "adminpassword")["username"]
+    token = login_user(client, username, "adminpassword")
+    login = {"username": username, "password": "adminpassword"}
+    profiled = {"Authorization": f"Bearer {token}", "X-Profile": "collapsed"}
+
+    # Ignored while the profiler is off, and for non-admins
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    response = client.post("/users/login", json=login, headers=profiled)
+    assert "access_token" in response.json()
+
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    response = client.post("/users/login", json=login, headers=profiled)
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+    assert response.headers["content-type"].startswith("text/plain")
+    # The bcrypt check runs in the password hashing pool
+    assert "_verify_password" in response.text
+
+    response = client.post("/users/login", json=dict(login, password="wrong"), headers=profiled)
+    assert response.headers["X-Profiled-Status"] == "401"
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", False)
+    assert "access_token" in client.post("/users/login", json=login, headers=profiled).json()
@@ -0,0 +1,82 @@
+from datetime import date
+import pytest
+from sqlalchemy import select
+from app.main import engine, models
+
+
+def query_plan(statement):
+    compiled = statement.compile(engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+
+HOT_QUERIES = {
+    "get_subscriptions": select(models.Subscription).where(
+        models.Subscription.user_id == 1
+    ),
+    "get_subscriptions_page": select(models.Subscription)
+    .where(models.Subscription.user_id == 1, models.Subscription.id > 10)
+    .order_by(models.Subscription.id)
+    .limit(101),
+    "get_subscriptions_is_active_page": select(models.Subscription)
+    .where(
+        models.Subscription.user_id == 1,
+        models.Subscription.is_active == True,
+        models.Subscription.id > 10,
+    )
+    .order_by(models.Subscription.id)
+    .limit(101),
+    "get_subscriptions_renewal_range": select(models.Subscription)
+    .where(
+        models.Subscription.user_id == 1,
+        models.Subscription.renewal_date >= date(2024, 1, 1),
+        models.Subscription.renewal_date <= date(2024, 12, 31),
+    ),
+    "renewals_due": select(models.Subscription.id)
+    .where(
+        models.Subscription.is_active == True,
+        models.Subscription.renewal_date <= date(2025, 1, 31),
+    )
+    .order_by(models.Subscription.renewal_date, models.Subscription.id)
+    .limit(1000),
+    "get_magazines_page": select(models.Magazine)
+    .where(models.Magazine.id > 10)
+    .order_by(models.Magazine.id)
+    .limit(101),
+    "create_subscription_duplicate_check": select(models.Subscription).where(
+        models.Subscription.user_id == 1,
+        models.Subscription.magazine_id == 2,
+        models.Subscription.plan_id == 3,
+        models.Subscription.is_active == True,
+    ),
+    "get_subscription": select(models.Subscription).where(models.Subscription.id == 1),
+    "reset_password": select(models.User).where(models.User.email == "user@example.com"),
+    "login": select(models.User).where(models.User.username == "user"),
+    "refresh_token": select(models.User).where(
+        models.User.username == "user", models.User.id == 1
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(name):
+    plan = query_plan(HOT_QUERIES[name])
+    assert plan, f"No query plan for {name}"
+    assert all("USING" in step for step in plan), f"{name} scans a table: {plan}"
+
+
+def test_active_subscription_index_is_unique():
+    with engine.connect() as connection:
+        indexes = connection.exec_driver_sql("PRAGMA index_list('subscriptions')").all()
+    unique_partial = {row[1] for row in indexes if row[2] and row[4]}
+    assert "uq_subscriptions_active_user_magazine_plan" in unique_partial
+
+
+def test_expiry_sweep_uses_partial_index():
+    from app.expiry import expire_chunk
+
+    plan = query_plan(expire_chunk(date(2025, 1, 24), 1000))
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    assert any("ix_subscriptions_active_renewal_date" in step for step in plan), plan
@@ -1,6 +1,8 @@
+import json
+import time
 from operator import ge
 import pytest
-from .utils import create_user, generate_random_plan_name, login_user, create_plan, create_magazine
+from .utils import count_queries, create_user, generate_random_plan_name, login_user, create_plan, create_magazine
 
 
 def test_create_subscription(client, unique_username, unique_email):
@@ -337,3 +339,515 @@ def test_unique_subscription_constraint(client, unique_username, unique_email):
     # Assert that the second subscription creation attempt fails
     assert response.status_code == 422, f"Response status code: {response.status_code}, Response body: {response.text}"
     assert "already exists" in response.text, "Expected error message for duplicate subscription not found"
+
+
+def test_create_subscription_round_trips(client, unique_username, unique_email):
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    plan = create_plan(client, headers, title=generate_random_plan_name(), discount=0.2)
+    magazine = create_magazine(client, headers, "round_trips", base_price=50)
+    payload = {
+        "user_id": user_id,
+        "magazine_id": magazine["id"],
+        "plan_id": plan["id"],
+        "renewal_date": "2024-12-31",
+    }
+
+    # Warm the catalog cache
+    client.get("/magazines/", headers=headers)
+    client.get("/plans/", headers=headers)
+
+    with count_queries() as statements:
+        response = client.post("/subscriptions/", json=payload, headers=headers)
+    assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+    assert response.json()["price"] == 50 * (1 - 0.2)
+    assert response.json()["is_active"] is True
+    # Prices come from the catalog cache; only the INSERT ... RETURNING
+    assert len(statements) == 1, statements
+
+    with count_queries() as statements:
+        response = client.post("/subscriptions/", json=payload, headers=headers)
+    assert response.status_code == 422, f"Response status code: {response.status_code}, Response body: {response.text}"
+    assert len(statements) == 1, statements
+
+
+def test_create_subscription_missing_catalog_entry(client, unique_username, unique_email):
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    response = client.post("/subscriptions/", json={
+        "user_id": user_id,
+        "magazine_id": 10**9,
+        "plan_id": plan["id"],
+        "renewal_date": "2024-12-31",
+    }, headers=headers)
+    assert response.status_code == 404, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+
+def test_get_subscriptions_keyset_pages(client, unique_username, unique_email):
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    plan = create_plan(client, headers, title=generate_random_plan_name(), discount=0.1)
+    created = []
+    for i, renewal_date in enumerate(["2024-01-31", "2024-06-30", "2025-01-31"]):
+        magazine = create_magazine(client, headers, f"pages_{i}", base_price=20)
+        response = client.post("/subscriptions/", json={
+            "user_id": user_id,
+            "magazine_id": magazine["id"],
+            "plan_id": plan["id"],
+            "renewal_date": renewal_date,
+        }, headers=headers)
+        assert response.status_code == 200, response.text
+        created.append(response.json())
+
+    seen, params = [], {"limit": 2}
+    while True:
+        response = client.get("/subscriptions/", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(item["id"] for item in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        assert 'rel="next"' in response.headers["Link"]
+        params = {"limit": 2, "cursor": cursor}
+    assert seen == sorted(item["id"] for item in created)
+
+    response = client.get(
+        "/subscriptions/",
+        params={"renewal_from": "2024-03-01", "renewal_to": "2024-12-31"},
+        headers=headers,
+    )
+    assert [item["id"] for item in response.json()] == [created[1]["id"]]
+
+    response = client.get(
+        "/subscriptions/",
+        params={"magazine_id": created[2]["magazine_id"], "is_active": True},
+        headers=headers,
+    )
+    assert [item["id"] for item in response.json()] == [created[2]["id"]]
+
+    response = client.get("/subscriptions/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400, response.text
+    response = client.get("/subscriptions/", params={"limit": 0}, headers=headers)
+    assert response.status_code == 422, response.text
+
+
+def test_create_subscriptions_bulk(client, unique_username, unique_email, monkeypatch):
+    from app.main import settings
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    plan = create_plan(client, headers, title=generate_random_plan_name(), discount=0.5)
+    magazines = [create_magazine(client, headers, f"bulk_{i}", base_price=10) for i in range(3)]
+    items = [
+        {"user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": "2025-01-31"}
+        for magazine in magazines
+    ]
+    payload = [
+        items[0],
+        items[1],
+        items[0],  # repeated within the batch
+        {**items[2], "plan_id": 10**9},
+        {"user_id": user_id, "magazine_id": "x"},
+    ]
+
+    monkeypatch.setattr(settings, "BULK_CHUNK_SIZE", 2)
+    response = client.post("/subscriptions/bulk", json=payload, headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == [
+        "created", "created", "duplicate", "not_found", "invalid",
+    ]
+    assert (body["created"], body["duplicate"], body["not_found"], body["invalid"]) == (2, 1, 1, 1)
+    assert body["results"][0]["subscription"]["price"] == 5
+    assert body["results"][1]["subscription"]["magazine_id"] == magazines[1]["id"]
+
+    # NDJSON stream; the first two now exist in the database
+    monkeypatch.setattr(settings, "BULK_CHUNK_SIZE", 500)
+    ndjson = "\n".join(json.dumps(item) for item in items) + "\n"
+    with count_queries() as statements:
+        response = client.post(
+            "/subscriptions/bulk",
+            content=ndjson,
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+    assert response.status_code == 200, response.text
+    assert [result["status"] for result in response.json()["results"]] == ["duplicate", "duplicate", "created"]
+    # Existing pairs and a single multi-row INSERT, whatever the batch size
+    assert len(statements) <= 3, statements
+
+    response = client.get("/subscriptions/", headers=headers)
+    assert len(response.json()) == 3
+
+    response = client.post("/subscriptions/bulk", content="{}", headers=headers)
+    assert response.status_code == 400, response.text
+
+    # Reading stops at the item limit, with one result for the rest
+    monkeypatch.setattr(settings, "BULK_MAX_ITEMS", 2)
+    response = client.post("/subscriptions/bulk", json=[{"user_id": user_id}] * 10, headers=headers)
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert "Batch limit of 2 items exceeded" in results[2]["detail"]
+
+    # Large JSON arrays, and overlong NDJSON lines, are refused
+    monkeypatch.setattr(settings, "BULK_MAX_JSON_BYTES", 100)
+    response = client.post("/subscriptions/bulk", json=items, headers=headers)
+    assert response.status_code == 413, response.text
+    response = client.post(
+        "/subscriptions/bulk",
+        content=json.dumps({**items[0], "padding": "x" * 200}) + "\n",
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 413, response.text
+
+
+def test_export_subscriptions(client, unique_username, unique_email, monkeypatch):
+    import csv
+    import gzip
+    import io
+    from app.main import settings
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+
+    plan = create_plan(client, headers, title=generate_random_plan_name(), discount=0.1)
+    magazine = create_magazine(client, headers, "export", base_price=10)
+    others = [create_magazine(client, headers, f"export_{i}", base_price=10) for i in range(3)]
+    items = [
+        {"user_id": user_id, "magazine_id": m["id"], "plan_id": plan["id"], "renewal_date": f"2025-0{i + 1}-15"}
+        for i, m in enumerate([magazine, *others])
+    ]
+    created = client.post("/subscriptions/bulk", json=items, headers=headers).json()["results"]
+    expected_ids = [result["subscription"]["id"] for result in created]
+
+    response = client.get("/admin/export/subscriptions", params={"plan_id": plan["id"]}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == expected_ids
+    assert rows[0]["renewal_date"] == "2025-01-15" and rows[0]["price"] == 9
+
+    response = client.get(
+        "/admin/export/subscriptions",
+        params={"plan_id": plan["id"], "format": "csv", "gzip": True, "renewal_from": "2025-02-01"},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert [int(row["id"]) for row in rows] == expected_ids[1:]
+
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [])
+    response = client.get("/admin/export/subscriptions", headers=headers)
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_incremental_snapshot(client, unique_username, unique_email, tmp_path, fmt):
+    pytest.importorskip("pyarrow")
+    from app.main import SessionLocal
+    from app.snapshot import read_snapshot, write_snapshot
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    magazines = [create_magazine(client, headers, f"snapshot_{fmt}_{i}", base_price=10) for i in range(2)]
+
+    def subscribe(magazine):
+        return client.post("/subscriptions/", json={
+            "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": "2025-03-01",
+        }, headers=headers).json()
+
+    first = subscribe(magazines[0])
+    full = write_snapshot(SessionLocal, "subscriptions", str(tmp_path), fmt)
+    assert full.max_id >= first["id"]
+
+    second = subscribe(magazines[1])
+    part = write_snapshot(SessionLocal, "subscriptions", str(tmp_path), fmt, incremental=True)
+    assert (part.rows, part.min_id, part.max_id) == (1, second["id"], second["id"])
+    assert write_snapshot(SessionLocal, "subscriptions", str(tmp_path), fmt, incremental=True).rows == 0
+
+    table = read_snapshot(str(tmp_path), "subscriptions")
+    assert table.num_rows == full.rows + 1
+    rows = {row["id"]: row for row in table.to_pylist()}
+    assert str(rows[second["id"]]["renewal_date"]) == "2025-03-01"
+    assert rows[second["id"]]["is_active"] is True
+
+    write_snapshot(SessionLocal, "users", str(tmp_path), fmt)
+    users = read_snapshot(str(tmp_path), "users")
+    assert "hashed_password" not in users.column_names
+    assert username in users.column("username").to_pylist()
+
+
+def test_renewal_dates():
+    from datetime import date
+    from app.renewals import add_months, next_renewal
+
+    assert add_months(date(2024, 1, 31), 1) == date(2024, 2, 29)
+    assert add_months(date(2024, 11, 15), 3) == date(2025, 2, 15)
+    assert next_renewal(date(2025, 1, 10), 1, date(2025, 1, 10)) == date(2025, 2, 10)
+    # Several missed periods catch up in one step
+    assert next_renewal(date(2024, 1, 31), 3, date(2025, 1, 31)) == date(2025, 4, 30)
+
+
+def test_run_renewals(client, unique_username, unique_email):
+    from datetime import date
+    from app.main import SessionLocal
+    from app.renewals import run_renewals
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name(), renewal_period=3, discount=0.5)
+    magazines = [create_magazine(client, headers, f"renew_{i}", base_price=10) for i in range(3)]
+    subscriptions = [
+        client.post("/subscriptions/", json={
+            "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": renewal_date,
+        }, headers=headers).json()
+        for magazine, renewal_date in zip(magazines, ["2025-01-15", "2025-01-31", "2025-02-01"])
+    ]
+    client.put(f"/magazines/{magazines[0]['id']}", json={
+        "name": "Magazine renew_0", "description": "Repriced", "base_price": 30,
+    }, headers=headers)
+
+    progress = []
+    report = run_renewals(SessionLocal, date(2025, 1, 31), chunk_size=1, on_progress=lambda r: progress.append(r.renewed))
+    assert report.renewed >= 2 and report.contended == 0
+    assert progress == sorted(progress) and report.chunks == len(progress)
+
+    renewed = {s["id"]: s for s in client.get("/subscriptions/", headers=headers).json()}
+    assert renewed[subscriptions[0]["id"]]["renewal_date"] == "2025-04-15"
+    assert renewed[subscriptions[0]["id"]]["price"] == 15
+    assert renewed[subscriptions[1]["id"]]["renewal_date"] == "2025-04-30"
+    assert renewed[subscriptions[2]["id"]]["renewal_date"] == "2025-02-01"
+
+    assert run_renewals(SessionLocal, date(2025, 1, 31)).renewed == 0
+
+
+def test_sweep_expired(client, unique_username, unique_email):
+    from datetime import date
+    from app.main import SessionLocal
+    from app.expiry import sweep_expired
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    magazines = [create_magazine(client, headers, f"expire_{i}") for i in range(4)]
+    subscriptions = [
+        client.post("/subscriptions/", json={
+            "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": renewal_date,
+        }, headers=headers).json()
+        for magazine, renewal_date in zip(magazines, ["2000-01-05", "2000-01-12", "2000-01-13", "2000-01-15"])
+    ]
+
+    progress = []
+    report = sweep_expired(SessionLocal, date(2000, 1, 20), grace_days=7, chunk_size=1, on_progress=lambda r: progress.append(r.expired))
+    assert report.as_dict()["cutoff"] == "2000-01-13"
+    assert report.expired == 2 and progress == [1, 2]
+    assert report.as_dict()["lag_days"] == 8
+
+    swept = {s["id"]: s["is_active"] for s in client.get("/subscriptions/", headers=headers).json()}
+    assert [swept[s["id"]] for s in subscriptions] == [False, False, True, True]
+    assert sweep_expired(SessionLocal, date(2000, 1, 20), grace_days=7).expired == 0
+
+
+def test_archive_subscriptions(client, unique_username, unique_email):
+    from datetime import date
+    from app.main import SessionLocal
+    from app.archive import archive_subscriptions
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    magazines = [create_magazine(client, headers, f"archive_{i}") for i in range(4)]
+    subscriptions = [
+        client.post("/subscriptions/", json={
+            "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": renewal_date,
+        }, headers=headers).json()
+        for magazine, renewal_date in zip(magazines, ["1990-01-01", "1990-01-02", "1990-01-03", "2030-01-01"])
+    ]
+    for subscription in subscriptions[:2]:
+        client.delete(f"/subscriptions/{subscription['id']}", headers=headers)
+
+    report = archive_subscriptions(SessionLocal, date(1990, 6, 1), older_than_days=30, batch_size=1)
+    assert (report.archived, report.batches) == (2, 2)
+
+    listed = {s["id"] for s in client.get("/subscriptions/", headers=headers).json()}
+    assert listed == {subscriptions[2]["id"], subscriptions[3]["id"]}
+    # History lookups fall back to the archive
+    archived = client.get(f"/subscriptions/{subscriptions[0]['id']}", headers=headers)
+    assert archived.status_code == 200
+    assert archived.json() == {**subscriptions[0], "is_active": False, "version": 2}
+    # Only to their owner
+    other = create_user(client, "other" + unique_username, "other" + unique_email, "otherpassword")
+    other_headers = {"Authorization": f"Bearer {login_user(client, other['username'], 'otherpassword')}"}
+    assert client.get(f"/subscriptions/{subscriptions[0]['id']}", headers=other_headers).status_code == 404
+    assert client.get(f"/subscriptions/{subscriptions[3]['id']}", headers=other_headers).status_code == 404
+
+    assert archive_subscriptions(SessionLocal, date(1990, 6, 1), older_than_days=30).archived == 0
+
+
+def test_modify_subscription_replaces_row(client, unique_username, unique_email):
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name(), discount=0.1)
+    new_plan = create_plan(client, headers, title=generate_random_plan_name(), discount=0.5)
+    magazine = create_magazine(client, headers, "modify_sub", base_price=100)
+    original = client.post("/subscriptions/", json={
+        "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": "2025-06-30",
+    }, headers=headers).json()
+    assert original["version"] == 1
+
+    update = {"user_id": user_id, "magazine_id": magazine["id"], "plan_id": new_plan["id"], "renewal_date": "2025-09-30"}
+    response = client.put(f"/subscriptions/{original['id']}", json={**update, "version": 1}, headers=headers)
+    assert response.status_code == 200, response.text
+    modified = response.json()
+    assert modified["id"] != original["id"]
+    assert (modified["price"], modified["plan_id"], modified["is_active"]) == (50, new_plan["id"], True)
+    assert client.get(f"/subscriptions/{original['id']}", headers=headers).json() == {**original, "is_active": False, "version": 2}
+
+    # Stale version, or a row that was already replaced
+    response = client.put(f"/subscriptions/{modified['id']}", json={**update, "version": 7}, headers=headers)
+    assert response.status_code == 409
+    response = client.put(f"/subscriptions/{original['id']}", json=update, headers=headers)
+    assert response.status_code == 409
+    response = client.put("/subscriptions/999999999", json=update, headers=headers)
+    assert response.status_code == 404
+
+    # Another user's subscription is not found, and stays untouched
+    other = create_user(client, "other" + unique_username, "other" + unique_email, "otherpassword")
+    other_headers = {"Authorization": f"Bearer {login_user(client, other['username'], 'otherpassword')}"}
+    response = client.put(f"/subscriptions/{modified['id']}", json=update, headers=other_headers)
+    assert response.status_code == 404
+    assert client.get(f"/subscriptions/{modified['id']}", headers=headers).json() == modified
+
+
+def test_concurrent_modifies_leave_one_active_subscription(client, unique_username, unique_email):
+    from concurrent.futures import ThreadPoolExecutor
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plans = [create_plan(client, headers, title=generate_random_plan_name()) for _ in range(2)]
+    magazine = create_magazine(client, headers, "concurrent_modify")
+    original = client.post("/subscriptions/", json={
+        "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plans[0]["id"], "renewal_date": "2025-06-30",
+    }, headers=headers).json()
+
+    def modify(i):
+        return client.put(f"/subscriptions/{original['id']}", json={
+            "user_id": user_id,
+            "magazine_id": magazine["id"],
+            "plan_id": plans[i % 2]["id"],
+            "renewal_date": "2025-09-30",
+            "version": original["version"],
+        }, headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=100) as pool:
+        statuses = list(pool.map(modify, range(100)))
+    assert sorted(set(statuses)) == [200, 409] and statuses.count(200) == 1
+
+    active = client.get("/subscriptions/?is_active=true", headers=headers).json()
+    assert len(active) == 1
+
+
+def test_subscription_list_cache(client, unique_username, unique_email, monkeypatch):
+    from app.main import settings, subscription_cache
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    magazines = [create_magazine(client, headers, f"list_cache_{i}") for i in range(2)]
+    payload = {"user_id": user_id, "magazine_id": magazines[0]["id"], "plan_id": plan["id"], "renewal_date": "2025-06-30"}
+    first = client.post("/subscriptions/", json=payload, headers=headers).json()
+
+    listing = client.get("/subscriptions/", params={"limit": 1}, headers=headers)
+    with count_queries() as statements:
+        cached = client.get("/subscriptions/", params={"limit": 1}, headers=headers)
+    assert statements == []
+    assert cached.json() == listing.json() == [first]
+
+    # Writes invalidate the user's pages, including their pagination headers
+    second = client.post("/subscriptions/", json={**payload, "magazine_id": magazines[1]["id"]}, headers=headers).json()
+    page = client.get("/subscriptions/", params={"limit": 1}, headers=headers)
+    assert page.json() == [first] and "X-Next-Cursor" in page.headers
+    cached = client.get("/subscriptions/", params={"limit": 1}, headers=headers)
+    assert cached.headers["X-Next-Cursor"] == page.headers["X-Next-Cursor"]
+    client.delete(f"/subscriptions/{second['id']}", headers=headers)
+    listing = client.get("/subscriptions/", params={"is_active": True}, headers=headers)
+    assert listing.json() == [first]
+
+    assert client.get("/internal/subscription-cache", headers=headers).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    stats = client.get("/internal/subscription-cache", headers=headers).json()
+    assert stats["hits"] > 0 and stats["invalidations"] > 0 and stats["bytes"] > 0
+    assert subscription_cache.stats()["bytes"] <= subscription_cache.max_bytes
+
+
+def test_subscription_list_cache_bounds():
+    from app.subscription_cache import CachedList, SubscriptionListCache
+
+    cache = SubscriptionListCache(max_bytes=25, ttl=60)
+    entry = CachedList(b"x" * 10, {}, time.time())
+    for user_id in (1, 2):
+        cache.put(user_id, "", entry, cache.ticket())
+    cache.get(1, "")
+    # Least recently used user goes first
+    cache.put(3, "", entry, cache.ticket())
+    assert [cache.get(user_id, "") is not None for user_id in (1, 2, 3)] == [True, False, True]
+    assert cache.stats()["bytes"] == 20 and cache.stats()["evictions"] == 1
+
+    # A page read before an invalidation for the same user is not stored
+    ticket = cache.ticket()
+    cache.invalidate_user(4)
+    cache.put(4, "", entry, ticket)
+    cache.put(5, "", entry, ticket)
+    assert cache.get(4, "") is None and cache.get(5, "") is not None
+    assert cache.stats()["stale_fills"] == 1
+
+
+def test_sql_instrumentation(client, unique_username, unique_email, monkeypatch, caplog, query_budget):
+    from app.main import settings
+
+    username, _, user_id = create_user(client, unique_username, unique_email, "adminpassword").values()
+    token = login_user(client, username, "adminpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    magazine = create_magazine(client, headers, "instrumented")
+    client.get("/magazines/", headers=headers)
+    client.get("/plans/", headers=headers)
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", True)
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MS", 0.001)
+    # Warm catalog cache: the INSERT ... RETURNING and nothing else
+    query_budget[("POST", "/subscriptions/")] = 1
+    with caplog.at_level("WARNING", logger="instrumentation"):
+        response = client.post("/subscriptions/", json={
+            "user_id": user_id, "magazine_id": magazine["id"], "plan_id": plan["id"], "renewal_date": "2025-06-30",
+        }, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["X-DB-Queries"] == "1"
+    assert float(response.headers["X-DB-Time-Ms"]) >= float(response.headers["X-DB-Slowest-Ms"]) > 0
+    message = next(record.getMessage() for record in caplog.records if "POST /subscriptions/" in record.getMessage())
+    assert "1 queries" in message and "INSERT INTO subscriptions" in message
+
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADERS", False)
+    assert "X-DB-Queries" not in client.get("/subscriptions/", headers=headers).headers
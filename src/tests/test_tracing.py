@@ -0,0 +1,52 @@
+from opentelemetry.trace import SpanKind
+from .utils import create_magazine, create_plan, create_user, generate_random_plan_name, login_user
+
+
+def test_tracing_spans(client, unique_username, unique_email, span_exporter):
+    user = create_user(client, unique_username, unique_email, "password123")
+    token = login_user(client, user["username"], "password123")
+    headers = {"Authorization": f"Bearer {token}"}
+    plan = create_plan(client, headers, title=generate_random_plan_name())
+    magazine = create_magazine(client, headers, "traced", base_price=50)
+    response = client.post(
+        "/subscriptions/",
+        json={
+            "user_id": user["user_id"],
+            "magazine_id": magazine["id"],
+            "plan_id": plan["id"],
+            "price": 50,
+            "renewal_date": "2030-01-01",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    spans = span_exporter.get_finished_spans()
+    names = {span.name for span in spans}
+    assert {"bcrypt.hash", "bcrypt.verify"} <= names
+
+    server = next(span for span in spans if span.name == "POST /subscriptions/")
+    assert server.kind == SpanKind.SERVER
+    trace_id = server.context.trace_id
+    request = [span for span in spans if span.context.trace_id == trace_id]
+    by_id = {span.context.span_id: span for span in request}
+    names = {span.name for span in request}
+    assert {
+        "auth.get_current_user",
+        "fastapi.dependencies",
+        "fastapi.endpoint",
+        "fastapi.serialization",
+        "INSERT",
+        "db.commit",
+    } <= names
+
+    # Statements nest under the route handler's span
+    insert = next(span for span in request if span.name == "INSERT")
+    assert insert.attributes["db.query.text"].startswith("INSERT INTO subscriptions")
+    parents = []
+    parent = insert.parent
+    while parent is not None and parent.span_id in by_id:
+        parents.append(by_id[parent.span_id].name)
+        parent = by_id[parent.span_id].parent
+    assert "fastapi.endpoint" in parents
+    assert parents[-1] == "POST /subscriptions/"
@@ -74,3 +74,118 @@ def test_token_expiry(client, unique_username, unique_email):
     # Verify token has expired
     response = client.get("/users/me", headers=headers)
     assert response.status_code == 401, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+
+def test_password_work_runs_in_hash_pool(client, unique_username, unique_email):
+    from app.main import password_hasher
+
+    completed = password_hasher.stats()["completed"]
+    username = create_user(client, unique_username, unique_email, "poolpassword")["username"]
+    login_user(client, username, "poolpassword")
+
+    stats = password_hasher.stats()
+    assert stats["completed"] == completed + 2, f"Unexpected hash pool stats: {stats}"
+    assert stats["in_flight"] == 0
+
+
+def test_verified_token_cache(client, unique_username, unique_email):
+    from app.main import auth
+    from app.token_cache import token_digest
+
+    user = create_user(client, unique_username, unique_email, "cachepassword")
+    token = login_user(client, user["username"], "cachepassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    stats = auth.token_cache.stats()
+    for _ in range(3):
+        response = client.get("/users/me", headers=headers)
+        assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+    after = auth.token_cache.stats()
+    assert after["misses"] == stats["misses"] + 1
+    assert after["hits"] == stats["hits"] + 2
+
+    response = client.delete(f"/users/deactivate/{user['username']}", headers=headers)
+    assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+    assert auth.token_cache.get(token_digest(token)) is None
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 401, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+
+def test_logout_revokes_token(client, unique_username, unique_email):
+    username = create_user(client, unique_username, unique_email, "logoutpassword")["username"]
+    token = login_user(client, username, "logoutpassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+    response = client.post("/users/logout", headers=headers)
+    assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 401, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+
+def test_deactivated_user_tokens_are_revoked(client, unique_username, unique_email):
+    username = create_user(client, unique_username, unique_email, "revokepassword")["username"]
+    login_response = client.post("/users/login", json={"username": username, "password": "revokepassword"})
+    assert login_response.status_code == 200, f"Response status code: {login_response.status_code}, Response body: {login_response.text}"
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    refresh_headers = {"Authorization": f"Bearer {login_response.json()['refresh_token']}"}
+
+    response = client.delete(f"/users/deactivate/{username}", headers=headers)
+    assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 401, f"Response status code: {response.status_code}, Response body: {response.text}"
+    response = client.post("/users/token/refresh", headers=refresh_headers)
+    assert response.status_code == 401, f"Response status code: {response.status_code}, Response body: {response.text}"
+
+
+def test_revocation_bloom_filter_has_no_false_negatives():
+    from app.revocation import BloomFilter
+
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"key{i}".encode() for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other{i}".encode() in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_revocation_list_forgets_expired_tokens(client, unique_username, unique_email):
+    import os
+    import time
+    from app.main import auth
+    from .conftest import TestingSessionLocal
+
+    user_id = create_user(client, unique_username, unique_email, "revokedpassword")["user_id"]
+    revocations = auth.RevocationList(TestingSessionLocal, capacity=10)
+    revocations.rebuild()
+    expired, live = os.urandom(32), os.urandom(32)
+    with TestingSessionLocal() as db:
+        revocations.revoke_token(db, expired, user_id, time.time() - 1)
+        revocations.revoke_token(db, live, user_id, time.time() + 3600)
+    tokens = revocations.stats()["revoked_tokens"]
+
+    revocations.refresh()
+    assert revocations.stats()["revoked_tokens"] == tokens - 1
+    assert revocations.is_revoked(live, user_id)
+    assert not revocations.is_revoked(expired, user_id)
+
+
+def test_db_pool_stats(client, unique_username, unique_email, monkeypatch):
+    from app.main import settings
+
+    username = create_user(client, unique_username, unique_email, "poolstatspassword")["username"]
+    token = login_user(client, username, "poolstatspassword")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/internal/db-pool", headers=headers).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_USERNAMES", [username])
+    response = client.get("/internal/db-pool", headers=headers)
+    assert response.status_code == 200, f"Response status code: {response.status_code}, Response body: {response.text}"
+    stats = response.json()
+    assert stats["checkouts"] > 0
+    assert stats["pools"][0]["name"] == "sync"
@@ -1,4 +1,6 @@
 import random
+from contextlib import contextmanager
+from sqlalchemy import event
 from app.schemas.user import UserCreate
 from app.schemas.magazine import MagazineCreate
 
@@ -70,3 +72,23 @@ def generate_random_plan_name():
     random_words = ["Silver", "Gold", "Platinum", "Diamond", "Titanium"]
     random_suffix = random.randint(1000, 9999)
     return f"{random.choice(random_words)} Plan {random_suffix}"
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements the app's engines execute inside the block."""
+    from app.main import pool_stats
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = [engine for _, engine in pool_stats.engines]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)